@@ -3,20 +3,22 @@ import os
 import uuid
 from dotenv import load_dotenv
 
-from utils.ai_generator import generate_website
+# Heavy modules (openai/langgraph, faiss, sentence-transformers, pypdf) are imported
+# lazily inside main() so the login page renders without paying for them.
 from utils.preview import create_preview
 from utils.export import export_website
 from components.sidebar import render_sidebar
 from components.preview_panel import render_preview
 from components.customization import render_customization
-from components.ingestion_panel import render_ingestion_panel
 
 # Auth UI
-from components.login import render_auth, render_user_menu
+from components.login import render_auth, render_user_menu, restore_session
 
 # NEW: dashboard + persistence
 from components.dashboard import render_dashboard, load_project_into_state
-from data.projects import save_generation, get_project, update_project
+from data.projects import save_generation, get_project, update_project, WITHOUT_CODE
+from data.mongo import start_migrate
+from utils.warmup import start_warmup
 
 # Load environment: prefer .env, then fall back to .env.example (without overriding existing)
 load_dotenv()  # .env
@@ -44,6 +46,11 @@ st.session_state.setdefault("current_project_id", None)
 st.session_state.setdefault("builder_prompt", "")
 
 def main():
+    # Indexes and cleanups run once per database, off the render path
+    start_migrate()
+    # Refresh / new tab / restart: resume from the signed session token if present
+    restore_session()
+
     # Sidebar (account + your existing sidebar)
     render_user_menu()   # shows signed-in user + Sign out button (no-op if not signed in)
     render_sidebar()
@@ -55,6 +62,9 @@ def main():
         render_auth()    # renders Sign In / Create Account tabs (Mongo)
         return
 
+    # Signed in: start loading the embedding model in the background (once per process)
+    start_warmup()
+
     # Top-level navigation
     tabs = st.tabs(["🏠 Dashboard", "🛠️ Builder"])
     user_email = st.session_state.user["email"]
@@ -65,11 +75,12 @@ def main():
 
         # Show current project context + ingestion panel
         if st.session_state.get("current_project_id"):
-            proj = get_project(user_email, st.session_state.current_project_id)
+            proj = get_project(user_email, st.session_state.current_project_id, WITHOUT_CODE)
             if proj:
                 st.success(f"Current project: {proj['name']} ({proj['project_id']})")
 
                 # Documents & Knowledge Base (PDF/Image upload + FAISS indexing)
+                from components.ingestion_panel import render_ingestion_panel
                 render_ingestion_panel(user_email, st.session_state.current_project_id)
 
                 if st.button("Open in Builder"):
@@ -122,6 +133,7 @@ def main():
         if generate_button and user_prompt:
             with st.spinner("Generating your website..."):
                 try:
+                    from utils.ai_generator import generate_website
                     html_code, css_code, js_code = generate_website(
                         prompt=user_prompt,
                         options=st.session_state.customization_options
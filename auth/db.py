@@ -1,28 +1,30 @@
 # auth/db.py
 import os
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pymongo import MongoClient, ASCENDING
-from dotenv import load_dotenv
+from pymongo import ASCENDING
 
-load_dotenv()
+from data.mongo import collection, register_migration
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/wonder_ai")
-DB_NAME = os.getenv("DB_NAME", "wonder_ai")
+_users = collection("users")
 
-_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=4000)
-_db = _client[DB_NAME]
-_users = _db["users"]
+def _ensure_indexes():
+    _users.create_index([("email", ASCENDING)], unique=True, name="uniq_email")
 
-# Ensure a unique index on email once
-_users.create_index([("email", ASCENDING)], unique=True, name="uniq_email")
+register_migration("users:indexes:v1", _ensure_indexes)
+
+# bcrypt is deliberately CPU-heavy; cap how many run at once so a login spike
+# queues here instead of starving page renders (bcrypt releases the GIL)
+BCRYPT_CONCURRENCY = int(os.getenv("BCRYPT_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_CONCURRENCY, thread_name_prefix="bcrypt")
 
 def hash_password(plain: str) -> bytes:
-    return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt())
+    return _bcrypt_pool.submit(bcrypt.hashpw, plain.encode("utf-8"), bcrypt.gensalt()).result()
 
 def verify_password(plain: str, hashed: bytes) -> bool:
     try:
-        return bcrypt.checkpw(plain.encode("utf-8"), hashed)
+        return _bcrypt_pool.submit(bcrypt.checkpw, plain.encode("utf-8"), hashed).result()
     except Exception:
         return False
 
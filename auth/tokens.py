@@ -0,0 +1,153 @@
+# auth/tokens.py
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import secrets
+import threading
+from datetime import datetime
+from typing import Optional
+from pymongo import ASCENDING
+
+from data.mongo import collection, register_migration
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_S = int(os.getenv("SESSION_TTL_HOURS", "168")) * 3600
+# Other processes' revocations are picked up within this many seconds
+_REVOCATION_REFRESH_S = float(os.getenv("SESSION_REVOCATION_REFRESH_S", "30"))
+_SECRET_FILE = os.getenv("SESSION_SECRET_FILE", "./.session_secret")
+
+_revoked = collection("revoked_sessions")
+
+def _ensure_indexes():
+    # Entries are only needed until the token would have expired anyway
+    _revoked.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0, name="ttl_expires_at")
+
+register_migration("revoked_sessions:indexes:v1", _ensure_indexes)
+
+_secret = None
+_secret_lock = threading.Lock()
+_revoked_ids = set()
+_revoked_loaded_at = 0.0
+_revoked_lock = threading.Lock()
+
+def _read_secret_file() -> bytes:
+    with open(_SECRET_FILE, "rb") as f:
+        secret = f.read().strip()
+    if not secret:
+        raise RuntimeError(f"Session secret file {_SECRET_FILE} is empty; delete it or set SESSION_SECRET")
+    return secret
+
+def _create_secret_file() -> bytes:
+    """Write a new random key to SESSION_SECRET_FILE, or return the one another
+    process wrote first. The key is written to a temp file and linked into place,
+    so readers never see a partial or empty file.
+    """
+    secret = secrets.token_hex(32).encode("ascii")
+    tmp = f"{_SECRET_FILE}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(secret)
+            f.flush()
+            os.fsync(f.fileno())
+        os.link(tmp, _SECRET_FILE)
+    except FileExistsError:
+        return _read_secret_file()
+    finally:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    return secret
+
+def _get_secret() -> bytes:
+    """SESSION_SECRET, else a random key kept in SESSION_SECRET_FILE so tokens survive restarts."""
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                env = os.getenv("SESSION_SECRET")
+                if env is not None and not env.strip():
+                    raise RuntimeError("SESSION_SECRET is set but empty")
+                if env:
+                    _secret = env.encode("utf-8")
+                elif os.path.exists(_SECRET_FILE):
+                    _secret = _read_secret_file()
+                else:
+                    _secret = _create_secret_file()
+    return _secret
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _unb64(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+def _sign(body: str) -> str:
+    return _b64(hmac.new(_get_secret(), body.encode("ascii"), hashlib.sha256).digest())
+
+def issue_token(user: dict, ttl: int = SESSION_TTL_S) -> str:
+    """Signed, expiring token for a session-state user dict ({id, email, name, role})."""
+    payload = {**user, "exp": int(time.time()) + ttl, "jti": secrets.token_hex(8)}
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return f"{body}.{_sign(body)}"
+
+def _refresh_revoked():
+    global _revoked_loaded_at
+    if time.monotonic() - _revoked_loaded_at < _REVOCATION_REFRESH_S:
+        return
+    with _revoked_lock:
+        if time.monotonic() - _revoked_loaded_at < _REVOCATION_REFRESH_S:
+            return
+        try:
+            _revoked_ids.update(d["_id"] for d in _revoked.find({}, {"_id": 1}))
+        except Exception as e:
+            # Keep serving from the last known list; retry on the next interval
+            logger.warning(f"Could not load revoked sessions: {e}")
+        _revoked_loaded_at = time.monotonic()
+
+def verify_token(token: Optional[str]) -> Optional[dict]:
+    """The user dict from a valid, unexpired, unrevoked token; otherwise None.
+    No bcrypt and (apart from a periodic revocation refresh) no database access.
+    """
+    if not token or token.count(".") != 1:
+        return None
+    body, sig = token.split(".")
+    if not (body.isascii() and sig.isascii()) or not hmac.compare_digest(sig, _sign(body)):
+        return None
+    try:
+        payload = json.loads(_unb64(body))
+    except ValueError:
+        return None
+    if payload.get("exp", 0) < time.time():
+        return None
+    _refresh_revoked()
+    if payload.get("jti") in _revoked_ids:
+        return None
+    return {k: v for k, v in payload.items() if k not in ("exp", "jti")}
+
+def revoke_token(token: Optional[str]):
+    """Sign-out: reject this token here immediately and in other processes after their next refresh."""
+    if not token or token.count(".") != 1:
+        return
+    try:
+        payload = json.loads(_unb64(token.split(".")[0]))
+    except ValueError:
+        return
+    jti = payload.get("jti")
+    if not jti:
+        return
+    _revoked_ids.add(jti)
+    try:
+        _revoked.update_one(
+            {"_id": jti},
+            {"$set": {"expires_at": datetime.utcfromtimestamp(payload.get("exp", time.time()))}},
+            upsert=True,
+        )
+    except Exception as e:
+        logger.warning(f"Could not record revoked session {jti}: {e}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Embedding backend benchmark + parity check: PyTorch (sentence-transformers) vs. ONNX int8.
+
+Each backend runs in its own subprocess so load time and peak RSS are measured cleanly.
+Exits non-zero if mean cosine agreement with the PyTorch path drops below --min-cosine.
+
+Usage:
+    python -m benchmarks.bench_embedding_backends [--texts 512] [--batch 32]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+_WORDS = ("menu price tasting wine local farm chef season dinner lunch booking hotel tour "
+          "guide coffee bakery market fish cheese forest lake portfolio gallery contact").split()
+
+def _texts(n: int):
+    rng = random.Random(0)
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 150))) for _ in range(n)]
+
+def _child(args):
+    # Env must be set before utils.embeddings reads it at import time
+    os.environ["EMBEDDING_BACKEND"] = args.backend
+    os.environ["EMBEDDING_CACHE"] = "0"
+    t0 = time.perf_counter()
+    from utils.embeddings import Embeddings
+    Embeddings._get_model()
+    load_s = time.perf_counter() - t0
+
+    texts = _texts(args.texts)
+    Embeddings.embed(texts[:args.batch])  # warm-up
+    lat = []
+    t0 = time.perf_counter()
+    chunks = []
+    for start in range(0, len(texts), args.batch):
+        t = time.perf_counter()
+        chunks.append(Embeddings.embed(texts[start:start + args.batch]))
+        lat.append((time.perf_counter() - t) * 1000)
+    total = time.perf_counter() - t0
+    np.save(args.out, np.vstack(chunks))
+    lat.sort()
+    print(json.dumps({
+        "backend": args.backend,
+        "load_s": load_s,
+        "texts_per_s": len(texts) / total,
+        "batch_p50_ms": lat[len(lat) // 2],
+        "batch_p95_ms": lat[min(len(lat) - 1, int(len(lat) * 0.95))],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--texts", type=int, default=512)
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--min-cosine", type=float, default=0.99)
+    ap.add_argument("--backend", help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.backend:
+        return _child(args)
+
+    results, vectors = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("torch", "onnx"):
+            out = os.path.join(tmp, f"{backend}.npy")
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_embedding_backends", "--backend", backend,
+                 "--out", out, "--texts", str(args.texts), "--batch", str(args.batch)],
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            vectors[backend] = np.load(out)
+
+    for r in results:
+        print(f"{r['backend']:>6}: load {r['load_s']:.2f}s  {r['texts_per_s']:.0f} texts/s  "
+              f"batch p50 {r['batch_p50_ms']:.1f}ms p95 {r['batch_p95_ms']:.1f}ms  "
+              f"peak RSS {r['peak_rss_mb']:.0f}MB")
+
+    # Both paths return L2-normalized rows, so the row-wise dot product is the cosine
+    cos = (vectors["torch"] * vectors["onnx"]).sum(axis=1)
+    print(f"parity: cosine mean {cos.mean():.4f}  min {cos.min():.4f}")
+    if cos.mean() < args.min_cosine:
+        sys.exit(f"ONNX backend diverges from PyTorch (mean cosine {cos.mean():.4f} < {args.min_cosine})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark: vector-only search vs. hybrid (BM25 + FAISS) search.
+
+Usage:
+    python -m benchmarks.bench_hybrid_search [--docs 2000] [--queries 200]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from utils.vector_store import ProjectVectorStore
+
+_WORDS = ("menu price tasting wine local farm chef season dinner lunch booking "
+          "hotel tour guide coffee bakery market fish cheese forest lake").split()
+
+def _fake_doc(rng: random.Random, i: int) -> str:
+    body = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 120)))
+    return f"Product SKU-{i:05d} costs {rng.randint(5, 500)}.{rng.randint(0, 99):02d} SEK. {body}"
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return statistics.mean(samples), p(0.5), p(0.95)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=2000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProjectVectorStore(tmp)
+        texts = [_fake_doc(rng, i) for i in range(args.docs)]
+        t0 = time.perf_counter()
+        for start in range(0, len(texts), 256):
+            store.add_texts(texts[start:start + 256], [{"type": "doc", "pos": i} for i in range(start, start + 256)])
+        print(f"Indexed {args.docs} docs in {time.perf_counter() - t0:.2f}s")
+
+        queries = [f"SKU-{rng.randrange(args.docs):05d} {rng.choice(_WORDS)}" for _ in range(args.queries)]
+        store.search(queries[0], args.k)  # warm the encoder
+
+        for name, fn in (("vector", store.search), ("hybrid", store.hybrid_search)):
+            lat, exact = [], 0
+            for q in queries:
+                t = time.perf_counter()
+                hits = fn(q, args.k)
+                lat.append((time.perf_counter() - t) * 1000)
+                sku = q.split()[0]
+                exact += any(sku in h["text"] for h in hits)
+            mean, p50, p95 = _percentiles(lat)
+            print(f"{name:>7}: mean {mean:.2f}ms  p50 {p50:.2f}ms  p95 {p95:.2f}ms  "
+                  f"exact-match hit rate {exact / len(queries):.0%}")
+
+if __name__ == "__main__":
+    main()
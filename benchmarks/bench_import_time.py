@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: seconds to import app.py in a fresh interpreter, and which heavy
+modules (if any) got pulled in before the login page could render.
+
+Usage:
+    python -m benchmarks.bench_import_time [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_HEAVY = ("torch", "sentence_transformers", "faiss", "langgraph", "openai", "pypdf", "easyocr", "onnxruntime")
+
+_CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import app  # noqa: F401
+elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (_HEAVY,)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    samples, heavy = [], set()
+    for _ in range(args.runs):
+        proc = subprocess.run([sys.executable, "-c", _CHILD], capture_output=True, text=True, check=True)
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(r["seconds"])
+        heavy.update(r["heavy"])
+
+    print(f"import app: mean {statistics.mean(samples):.3f}s  "
+          f"min {min(samples):.3f}s  max {max(samples):.3f}s  ({args.runs} runs)")
+    print(f"heavy modules loaded at import: {', '.join(sorted(heavy)) or 'none'}")
+    if heavy:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
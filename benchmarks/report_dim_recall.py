@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Recall vs. dimension report for embedding reduction (PCA and random projection).
+
+Ground truth is exact top-k search on full-dimension vectors; each reduced index is
+scored by recall@k against it, with per-query latency and index size.
+
+Usage:
+    python -m benchmarks.report_dim_recall [--store ./vectorstores/<project_id>] [--k 10]
+"""
+import argparse
+import json
+import random
+import time
+
+import faiss
+import numpy as np
+
+from utils.embeddings import Embeddings
+from utils.vector_store import _make_reducer, _project
+
+_WORDS = ("menu price tasting wine local farm chef season dinner lunch booking hotel tour "
+          "guide coffee bakery market fish cheese forest lake portfolio gallery contact").split()
+
+def _load_texts(store_dir, n):
+    if store_dir:
+        with open(f"{store_dir}/meta.jsonl", encoding="utf-8") as f:
+            return [json.loads(line)["text"] for line in f if line.strip()][:n]
+    rng = random.Random(0)
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(20, 120))) for _ in range(n)]
+
+def _flat(vecs):
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    index.add(vecs)
+    return index
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--store", help="project vector store dir (default: synthetic corpus)")
+    ap.add_argument("--docs", type=int, default=5000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--dims", default="32,64,96,128,192,256")
+    args = ap.parse_args()
+
+    texts = _load_texts(args.store, args.docs + args.queries)
+    embs = Embeddings.embed(texts).astype(np.float32)
+    nq = min(args.queries, len(texts) // 5)
+    queries, corpus = embs[:nq], embs[nq:]
+    k = min(args.k, len(corpus))
+
+    _, truth = _flat(corpus).search(queries, k)
+    print(f"corpus {len(corpus)}  queries {nq}  full dim {corpus.shape[1]}  recall@{k}")
+    print(f"{'kind':>6} {'dim':>5} {'recall':>7} {'ms/query':>9} {'index MB':>9}")
+    for kind in ("pca", "random"):
+        for dim in [int(d) for d in args.dims.split(",") if int(d) < corpus.shape[1]]:
+            reducer = _make_reducer(kind, corpus.shape[1], dim)
+            reducer.train(corpus)
+            index = _flat(_project(corpus, reducer))
+            q = _project(queries, reducer)
+            t = time.perf_counter()
+            _, found = index.search(q, k)
+            ms = (time.perf_counter() - t) * 1000 / nq
+            recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(nq)])
+            size_mb = index.ntotal * dim * 4 / 1e6
+            print(f"{kind:>6} {dim:>5} {recall:>7.3f} {ms:>9.3f} {size_mb:>9.2f}")
+
+if __name__ == "__main__":
+    main()
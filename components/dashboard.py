@@ -1,7 +1,10 @@
 # components/dashboard.py
 import uuid
 import streamlit as st
-from data.projects import list_projects, create_project, get_project
+from data.projects import list_project_summaries, create_project, get_project
+from components.pagination import page_cursor, reset_pages, render_pager
+
+PROJECTS_PER_PAGE = 20
 
 def render_dashboard(user_email: str):
     st.header("Your Projects")
@@ -47,6 +50,8 @@ def render_dashboard(user_email: str):
 
                 st.session_state.current_project_id = doc["project_id"]
                 st.success("Project created.")
+                # Newest first: jump back to the page that shows it
+                reset_pages("projects")
 
                 # Clear nonce so a future create is a new op
                 st.session_state._create_nonce = None
@@ -54,7 +59,11 @@ def render_dashboard(user_email: str):
 
                 # No explicit st.rerun() needed; form submit already triggers a rerun.
 
-    projs = list_projects(user_email)
+    # Summaries only (no code/images), one keyset page per rerun
+    projs, next_cursor = list_project_summaries(user_email, limit=PROJECTS_PER_PAGE, cursor=page_cursor("projects"))
+    if not projs and page_cursor("projects"):
+        reset_pages("projects")
+        projs, next_cursor = list_project_summaries(user_email, limit=PROJECTS_PER_PAGE)
     if not projs:
         st.info("No projects yet. Create one above.")
         return
@@ -70,15 +79,16 @@ def render_dashboard(user_email: str):
             st.session_state.current_project_id = p["project_id"]
             st.success(f"Opened {p['name']}")
             # No hard rerun here either; button click already reruns the app.
+    render_pager("projects", next_cursor)
 
 def load_project_into_state(user_email: str, project_id: str):
-    from data.projects import get_project
+    from data.projects import get_project, project_code
     doc = get_project(user_email, project_id)
     if not doc:
         st.error("Project not found or you don't have access.")
         return None
-    # Load into session
-    st.session_state.generated_code = doc.get("code")
+    # Load into session (unpacks compressed / GridFS-stored code)
+    st.session_state.generated_code = project_code(doc)
     st.session_state.preview_url = doc.get("preview_url")
     # Keep the latest prompt/options visible in the builder UI
     st.session_state.builder_prompt = doc.get("prompt", "")
@@ -1,18 +1,19 @@
 # components/ingestion_panel.py
-import os, json, io, base64
+import os, json, io, base64, shutil
 import streamlit as st
 
-from data.projects import get_project, update_project
-from data.documents import upsert_document, list_documents
-from utils.ingestion import extract_text_from_pdf, extract_text_from_image, sniff_filetype
-from utils.vector_store import ProjectVectorStore
-from utils.glm_client import GLMClient
+from data.projects import get_project, update_project, WITHOUT_CODE
+from data.documents import list_document_summaries, get_document, find_document_by_hash
+from data.ingest_jobs import new_job_id, create_job, list_jobs, find_active_job_by_hash, ACTIVE
+from components.pagination import page_cursor, render_pager
+
+DOCUMENTS_PER_PAGE = 20
 
 def render_ingestion_panel(user_email: str, project_id: str):
     st.subheader("📎 Documents & Knowledge Base")
 
     # Load current prompt from project
-    proj = get_project(user_email, project_id)
+    proj = get_project(user_email, project_id, WITHOUT_CODE)
     init_prompt = proj.get("prompt", "") if proj else ""
 
     with st.expander("Initial thinking prompt (used when parsing docs)", expanded=True):
@@ -26,61 +27,96 @@ def render_ingestion_panel(user_email: str, project_id: str):
     files = st.file_uploader("Upload files", type=["pdf", "png", "jpg", "jpeg", "webp"], accept_multiple_files=True)
 
     if st.button("Process & Index", type="primary") and files:
-        glm = GLMClient()
-        store = ProjectVectorStore.for_project(project_id)
-        processed = 0
-
-        for f in files:
-            fbytes = f.read()
-            ftype = sniff_filetype(f.name)
-            text = ""
-            if ftype == "pdf":
-                text = extract_text_from_pdf(fbytes)
-            elif ftype == "image":
-                text = extract_text_from_image(fbytes)
-                if not text:
-                    # As a fallback, pass a note; user can re-run with OCR installed
-                    text = "[Image uploaded; install easyocr to OCR locally, or enable multimodal LLM to interpret directly.]"
+        from utils.ingestion import sniff_filetype
+        from utils.ingest_worker import (
+            ensure_workers, spool_path, spool_upload, UploadTooLarge, MAX_UPLOAD_BYTES, SPOOL_DIR,
+        )
 
-            # Always add raw text to vector store (chunked lightly)
-            chunks = _chunk_text(text, 1000, 200) if text else ["(no text extracted)"]
-            metas = [{"type": "doc", "file": f.name, "pos": i} for i, _ in enumerate(chunks)]
-            store.add_texts(chunks, metas)
+        skipped = []
+        in_progress = []
+        rejected = []
+        job_id = new_job_id()
+        queued = []
+        queued_hashes = set()
+        for idx, f in enumerate(files):
+            if f.size > MAX_UPLOAD_BYTES:
+                rejected.append(f"{f.name} (larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)")
+                continue
+            # Workers read uploads from disk, so a rerun or refresh can't lose them.
+            # Spooling streams in chunks and hashes on the way, without copying the bytes.
+            path = spool_path(job_id, idx, f.name)
+            try:
+                size, h = spool_upload(f, path)
+            except UploadTooLarge as e:
+                rejected.append(f"{f.name} ({e})")
+                continue
+            # Skip uploads whose bytes are already indexed in this project
+            prev = get_document(user_email, project_id, f.name)
+            dup = prev if prev and prev.get("content_hash") == h else find_document_by_hash(user_email, project_id, h)
+            if dup:
+                os.remove(path)
+                skipped.append(f.name if dup.get("doc_id") == f.name else f"{f.name} (same as {dup.get('doc_id')})")
+                continue
+            # ...or still being indexed by an earlier click (uploads stay in the widget), or
+            # repeated in this batch: indexing the same bytes twice at once duplicates chunks
+            if h in queued_hashes or find_active_job_by_hash(user_email, project_id, h):
+                os.remove(path)
+                in_progress.append(f.name)
+                continue
+            queued_hashes.add(h)
+            queued.append({"name": f.name, "path": path, "kind": sniff_filetype(f.name),
+                           "size": size, "content_hash": h})
 
-            # Ask LLM for a compact analysis using the project's initial prompt
-            analysis = glm.analyze_text(new_prompt or init_prompt, text[:6000] if text else f"(Image file: {f.name})")
-            upsert_document(user_email, project_id, doc_id=f.name, meta={
-                "file": f.name,
-                "analysis": analysis,
-                "size": len(fbytes),
-                "kind": ftype,
-            })
-            processed += 1
+        if queued:
+            create_job(job_id, user_email, project_id, new_prompt or init_prompt, queued)
+            ensure_workers()
+            st.success(f"Queued {len(queued)} file(s) for processing. Progress is shown below.")
+        else:
+            shutil.rmtree(os.path.join(SPOOL_DIR, job_id), ignore_errors=True)
+        if skipped:
+            st.info("Already indexed, skipped: " + ", ".join(skipped))
+        if in_progress:
+            st.info("Already queued for indexing, skipped: " + ", ".join(in_progress))
+        if rejected:
+            st.error("Too large, not uploaded: " + ", ".join(rejected))
 
-        st.success(f"Processed and indexed {processed} file(s).")
+    _render_jobs(user_email, project_id)
 
-    # Show existing docs
-    docs = list_documents(user_email, project_id)
+    # Show existing docs: summaries page by page; each analysis is loaded only when opened
+    pager = f"docs_{project_id}"
+    docs, next_cursor = list_document_summaries(user_email, project_id, limit=DOCUMENTS_PER_PAGE,
+                                                cursor=page_cursor(pager))
     if docs:
         st.markdown("**Indexed documents:**")
         for d in docs:
             st.markdown("---")
             st.write(f"**{d.get('file','(unknown)')}** — {d.get('kind','')} • {d.get('size',0)} bytes")
-            st.code(d.get("analysis", ""), language="json")
+            if st.toggle("Show analysis", key=f"analysis_{project_id}_{d['doc_id']}"):
+                full = get_document(user_email, project_id, d["doc_id"]) or {}
+                st.code(full.get("analysis", ""), language="json")
+    render_pager(pager, next_cursor)
+
 
+def _render_jobs(user_email: str, project_id: str):
+    jobs = list_jobs(user_email, project_id)
+    active = [j for j in jobs if j["status"] in ACTIVE]
+    if not jobs:
+        return
+    if active:
+        # Resume queued/interrupted jobs after a server restart
+        from utils.ingest_worker import ensure_workers
+        ensure_workers()
 
-def _chunk_text(text: str, size: int, overlap: int):
-    text = text or ""
-    if len(text) <= size:
-        return [text]
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + size
-        chunks.append(text[start:end])
-        start = end - overlap
-        if start < 0:
-            start = 0
-        if start >= len(text):
-            break
-    return chunks
+    st.markdown("**Ingestion jobs:**")
+    for job in jobs[:3]:
+        st.caption(f"Job `{job['_id']}` — {job['status']}" + (f" ({job['error']})" if job.get("error") else ""))
+        for f in job["files"]:
+            total = f.get("pages_total") or 0
+            done = f.get("pages_done") or 0
+            frac = 1.0 if f["state"] == "done" else (min(done / total, 1.0) if total else 0.0)
+            label = f"{f['name']}: {f['state']}" + (f" — page {done}/{total}" if f["state"] == "indexing" and total else "")
+            if f.get("error"):
+                label += f" — {f['error']}"
+            st.progress(frac, text=label)
+    if active:
+        st.button("Refresh progress", key="refresh_ingest_jobs")
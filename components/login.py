@@ -1,6 +1,53 @@
 # components/login.py
 import streamlit as st
 from auth.db import authenticate, create_user, get_user_by_email
+from auth.tokens import issue_token, verify_token, revoke_token
+
+# Query parameter carrying the signed session token, so refreshes, new tabs on the
+# same URL and server restarts don't need a password (and bcrypt) again
+_TOKEN_PARAM = "session"
+
+def _get_token_param():
+    if hasattr(st, "query_params"):
+        return st.query_params.get(_TOKEN_PARAM)
+    values = st.experimental_get_query_params().get(_TOKEN_PARAM)
+    return values[0] if values else None
+
+def _set_token_param(token):
+    if hasattr(st, "query_params"):
+        if token:
+            st.query_params[_TOKEN_PARAM] = token
+        else:
+            st.query_params.pop(_TOKEN_PARAM, None)
+        return
+    params = st.experimental_get_query_params()
+    if token:
+        params[_TOKEN_PARAM] = token
+    else:
+        params.pop(_TOKEN_PARAM, None)
+    st.experimental_set_query_params(**params)
+
+def _sign_in(user: dict):
+    st.session_state.user = {
+        "id": str(user["_id"]),
+        "email": user["email"],
+        "name": user.get("full_name") or user["email"].split("@")[0],
+        "role": user.get("role", "user"),
+    }
+    st.session_state.session_token = issue_token(st.session_state.user)
+    _set_token_param(st.session_state.session_token)
+
+def restore_session():
+    """Sign in from a valid session token in the URL (HMAC check only, no DB or bcrypt)."""
+    if st.session_state.get("user"):
+        return
+    token = _get_token_param()
+    user = verify_token(token)
+    if user:
+        st.session_state.user = user
+        st.session_state.session_token = token
+    elif token:
+        _set_token_param(None)
 
 def render_auth():
     st.markdown("### Sign in to continue")
@@ -18,12 +65,7 @@ def render_auth():
                 else:
                     user = authenticate(email, password)
                     if user:
-                        st.session_state.user = {
-                            "id": str(user["_id"]),
-                            "email": user["email"],
-                            "name": user.get("full_name") or user["email"].split("@")[0],
-                            "role": user.get("role", "user"),
-                        }
+                        _sign_in(user)
                         st.success(f"Welcome back, {st.session_state.user['name']}!")
                         st.rerun()
                     else:
@@ -45,12 +87,7 @@ def render_auth():
                     st.error("An account with that email already exists.")
                 else:
                     user = create_user(email, password, full_name)
-                    st.session_state.user = {
-                        "id": str(user["_id"]),
-                        "email": user["email"],
-                        "name": user.get("full_name") or user["email"].split("@")[0],
-                        "role": user.get("role", "user"),
-                    }
+                    _sign_in(user)
                     st.success("Account created. You’re signed in!")
                     st.rerun()
 
@@ -61,7 +98,9 @@ def render_user_menu():
     with st.sidebar.expander("Account", expanded=True):
         st.write(f"**Signed in as:** {user['name']} ({user['email']})")
         if st.button("Sign out"):
-            for k in ["user", "generated_code", "preview_url"]:
+            revoke_token(st.session_state.get("session_token"))
+            _set_token_param(None)
+            for k in ["user", "session_token", "generated_code", "preview_url"]:
                 st.session_state.pop(k, None)
             st.success("Signed out.")
             st.rerun()
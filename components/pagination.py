@@ -0,0 +1,24 @@
+# components/pagination.py
+import streamlit as st
+
+def page_cursor(key: str):
+    """Cursor for the page currently shown in list ``key`` (None = first page)."""
+    stack = st.session_state.setdefault(f"_pages_{key}", [None])
+    return stack[-1]
+
+def reset_pages(key: str):
+    st.session_state[f"_pages_{key}"] = [None]
+
+def render_pager(key: str, next_cursor):
+    """Previous/Next buttons; the cursors of pages already visited are kept in session state."""
+    stack = st.session_state.setdefault(f"_pages_{key}", [None])
+    if len(stack) == 1 and not next_cursor:
+        return
+    c1, c2, c3 = st.columns([1, 1, 4])
+    if c1.button("← Previous", key=f"prev_{key}", disabled=len(stack) == 1):
+        stack.pop()
+        st.rerun()
+    if c2.button("Next →", key=f"next_{key}", disabled=not next_cursor):
+        stack.append(next_cursor)
+        st.rerun()
+    c3.caption(f"Page {len(stack)}")
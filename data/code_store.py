@@ -0,0 +1,80 @@
+# data/code_store.py
+import os
+import json
+import logging
+from typing import Any, Dict, Optional
+from bson import Binary
+from pymongo import ASCENDING
+
+from data.mongo import get_db, collection, register_migration
+from data.compression import compress, decompress
+
+# Generated code above this size is stored compressed on the project document...
+COMPRESS_MIN_BYTES = int(os.getenv("CODE_COMPRESS_MIN_KB", "64")) * 1024
+# ...and above this (compressed) size in GridFS, well clear of the 16 MB document limit
+GRIDFS_MIN_BYTES = int(os.getenv("CODE_GRIDFS_MIN_MB", "4")) * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+_BUCKET = "code_blobs"
+_files = collection(f"{_BUCKET}.files")
+_fs = None
+
+def _ensure_indexes():
+    _files.create_index([("metadata.user_email", ASCENDING), ("metadata.project_id", ASCENDING)],
+                        name="user_project")
+
+register_migration("code_blobs:indexes:v1", _ensure_indexes)
+
+def _gridfs():
+    global _fs
+    if _fs is None:
+        import gridfs
+        _fs = gridfs.GridFS(get_db(), collection=_BUCKET)
+    return _fs
+
+def is_packed(stored: Any) -> bool:
+    return isinstance(stored, dict) and stored.get("packed") is True
+
+def pack_code(user_email: str, project_id: str, code: Optional[Dict[str, str]]):
+    """Value to store in a project's ``code`` field: the dict itself when small,
+    otherwise {"packed", "codec", "size"} plus inline ``data`` or a GridFS ``file_id``.
+    """
+    if not code:
+        return code
+    raw = json.dumps(code, ensure_ascii=False).encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return code
+    codec, blob = compress(raw)
+    packed = {"packed": True, "codec": codec, "size": len(raw)}
+    if len(blob) < GRIDFS_MIN_BYTES:
+        packed["data"] = Binary(blob)
+    else:
+        packed["file_id"] = _gridfs().put(
+            blob, metadata={"user_email": user_email.lower(), "project_id": project_id, "codec": codec}
+        )
+    return packed
+
+def unpack_code(stored) -> Optional[Dict[str, str]]:
+    """Inverse of pack_code; plain (small or legacy) values pass through unchanged.
+    Returns None if the GridFS file is gone (superseded by a later save).
+    """
+    if not is_packed(stored):
+        return stored
+    if "data" in stored:
+        blob = stored["data"]
+    else:
+        import gridfs
+        try:
+            blob = _gridfs().get(stored["file_id"]).read()
+        except gridfs.NoFile:
+            logger.warning(f"Code file {stored['file_id']} no longer exists")
+            return None
+    return json.loads(decompress(stored["codec"], blob).decode("utf-8"))
+
+def drop_code_file(file_id):
+    """Delete one GridFS code file (the one a save just replaced); best effort."""
+    try:
+        _gridfs().delete(file_id)
+    except Exception as e:
+        logger.warning(f"Could not remove code file {file_id}: {e}")
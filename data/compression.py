@@ -0,0 +1,45 @@
+# data/compression.py
+import zlib
+from typing import Optional, Tuple
+
+try:
+    import zstandard as zstd  # optional: much better ratios and true whole-file deltas
+except ImportError:
+    zstd = None
+
+_ZSTD_LEVEL = 10
+_ZLIB_LEVEL = 6
+# zlib's preset dictionary only reaches back this far
+_ZLIB_WINDOW = 32 * 1024
+
+def compress(data: bytes, base: Optional[bytes] = None) -> Tuple[str, bytes]:
+    """Compress ``data``, as a delta against ``base`` when given (the base is used as a
+    raw-content dictionary, so text shared with it costs almost nothing).
+    Returns (codec, blob); pass both to decompress(), with the same base.
+    """
+    if zstd is not None:
+        if base:
+            d = zstd.ZstdCompressionDict(base, dict_type=zstd.DICT_TYPE_RAWCONTENT)
+            return "zstd-delta", zstd.ZstdCompressor(level=_ZSTD_LEVEL, dict_data=d).compress(data)
+        return "zstd", zstd.ZstdCompressor(level=_ZSTD_LEVEL).compress(data)
+    if base:
+        c = zlib.compressobj(_ZLIB_LEVEL, zdict=base[-_ZLIB_WINDOW:])
+        return "zlib-delta", c.compress(data) + c.flush()
+    return "zlib", zlib.compress(data, _ZLIB_LEVEL)
+
+def decompress(codec: str, blob: bytes, base: Optional[bytes] = None) -> bytes:
+    if codec == "raw":
+        return bytes(blob)
+    if codec.startswith("zstd"):
+        if zstd is None:
+            raise RuntimeError("This data is zstd-compressed; install the 'zstandard' package to read it")
+        if codec == "zstd-delta":
+            d = zstd.ZstdCompressionDict(base, dict_type=zstd.DICT_TYPE_RAWCONTENT)
+            return zstd.ZstdDecompressor(dict_data=d).decompress(blob)
+        return zstd.ZstdDecompressor().decompress(blob)
+    if codec == "zlib-delta":
+        d = zlib.decompressobj(zdict=base[-_ZLIB_WINDOW:])
+        return d.decompress(blob) + d.flush()
+    if codec == "zlib":
+        return zlib.decompress(blob)
+    raise ValueError(f"Unknown codec: {codec}")
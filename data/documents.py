@@ -1,19 +1,35 @@
 # data/documents.py
-import os
 from datetime import datetime
 from typing import Optional, Dict, Any
-from pymongo import MongoClient, ASCENDING
-from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import OperationFailure
 
-load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/wonder_ai")
-DB_NAME = os.getenv("DB_NAME", "wonder_ai")
+from data.mongo import collection, register_migration, keyset_page
 
-_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=4000)
-_db = _client[DB_NAME]
-_docs = _db["documents"]
+_docs = collection("documents")
 
-_docs.create_index([("user_email", ASCENDING), ("project_id", ASCENDING), ("doc_id", ASCENDING)], unique=True)
+def _ensure_indexes():
+    _docs.create_index([("user_email", ASCENDING), ("project_id", ASCENDING), ("doc_id", ASCENDING)], unique=True)
+    _docs.create_index([("user_email", ASCENDING), ("project_id", ASCENDING), ("content_hash", ASCENDING)])
+
+register_migration("documents:indexes:v1", _ensure_indexes)
+
+def _ensure_listing_index():
+    # Matches keyset_page's (updated_at, _id) sort so listing pages seek through the index
+    _docs.create_index(
+        [("user_email", ASCENDING), ("project_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+        name="user_project_updated_at_id",
+    )
+    try:
+        # Superseded: without _id it still needed an in-memory sort
+        _docs.drop_index("user_project_updated_at")
+    except OperationFailure:
+        pass
+
+register_migration("documents:indexes:v3", _ensure_listing_index)
+
+# What the indexed-documents list shows; the analysis is fetched per document on demand
+SUMMARY_PROJECTION = {"doc_id": 1, "file": 1, "kind": 1, "size": 1, "chunks": 1, "updated_at": 1}
 
 def _now():
     return datetime.utcnow()
@@ -25,5 +41,32 @@ def upsert_document(user_email: str, project_id: str, doc_id: str, meta: Dict[st
         upsert=True,
     )
 
+def upsert_documents(user_email: str, project_id: str, metas: Dict[str, Dict[str, Any]]) -> int:
+    """Upsert {doc_id: meta} in one bulk_write; returns the number of documents written."""
+    if not metas:
+        return 0
+    now = _now()
+    ops = [
+        UpdateOne(
+            {"user_email": user_email.lower(), "project_id": project_id, "doc_id": doc_id},
+            {"$set": {**meta, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+            upsert=True,
+        )
+        for doc_id, meta in metas.items()
+    ]
+    res = _docs.bulk_write(ops, ordered=False)
+    return res.upserted_count + res.matched_count
+
+def get_document(user_email: str, project_id: str, doc_id: str):
+    return _docs.find_one({"user_email": user_email.lower(), "project_id": project_id, "doc_id": doc_id})
+
+def find_document_by_hash(user_email: str, project_id: str, content_hash: str):
+    return _docs.find_one({"user_email": user_email.lower(), "project_id": project_id, "content_hash": content_hash})
+
 def list_documents(user_email: str, project_id: str):
     return list(_docs.find({"user_email": user_email.lower(), "project_id": project_id}).sort("updated_at", -1))
+
+def list_document_summaries(user_email: str, project_id: str, limit: int = 20, cursor: Optional[str] = None):
+    """Page of document summaries (no analysis), newest first. Returns (docs, next_cursor or None)."""
+    return keyset_page(_docs, {"user_email": user_email.lower(), "project_id": project_id},
+                       SUMMARY_PROJECTION, limit, cursor)
@@ -0,0 +1,106 @@
+# data/ingest_jobs.py
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from data.mongo import collection, register_migration
+
+_jobs = collection("ingest_jobs")
+
+def _ensure_indexes():
+    _jobs.create_index([("status", ASCENDING), ("lease_until", ASCENDING)], name="claim")
+    _jobs.create_index([("user_email", ASCENDING), ("project_id", ASCENDING), ("created_at", DESCENDING)], name="user_project_created")
+
+register_migration("ingest_jobs:indexes:v1", _ensure_indexes)
+
+ACTIVE = ("queued", "running")
+
+def _now():
+    return datetime.utcnow()
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def create_job(job_id: str, user_email: str, project_id: str, prompt: str, files: List[Dict[str, Any]]) -> dict:
+    """files: [{name, path, kind, size, content_hash}] already spooled to disk."""
+    now = _now()
+    doc = {
+        "_id": job_id,
+        "user_email": user_email.lower(),
+        "project_id": project_id,
+        "prompt": prompt or "",
+        "status": "queued",
+        "worker": None,
+        "lease_until": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "files": [
+            {**f, "state": "pending", "pages_done": 0, "pages_total": None,
+             "indexed": False, "analysis": None, "error": None}
+            for f in files
+        ],
+    }
+    _jobs.insert_one(doc)
+    return doc
+
+def claim_job(worker_id: str, lease_seconds: int) -> Optional[dict]:
+    """Atomically take the oldest queued job, or a running one whose worker stopped renewing its lease."""
+    now = _now()
+    return _jobs.find_one_and_update(
+        {"$or": [{"status": "queued"}, {"status": "running", "lease_until": {"$lt": now}}]},
+        {"$set": {"status": "running", "worker": worker_id,
+                  "lease_until": now + timedelta(seconds=lease_seconds), "updated_at": now}},
+        sort=[("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+def renew_lease(job_id: str, worker_id: str, lease_seconds: int) -> bool:
+    now = _now()
+    res = _jobs.update_one(
+        {"_id": job_id, "worker": worker_id, "status": "running"},
+        {"$set": {"lease_until": now + timedelta(seconds=lease_seconds), "updated_at": now}},
+    )
+    return res.matched_count == 1
+
+def update_file(job_id: str, idx: int, fields: Dict[str, Any]):
+    _jobs.update_one(
+        {"_id": job_id},
+        {"$set": {**{f"files.{idx}.{k}": v for k, v in fields.items()}, "updated_at": _now()}},
+    )
+
+def update_files(job_id: str, fields_by_idx: Dict[int, Dict[str, Any]]):
+    """update_file for several files of one job in a single write."""
+    if not fields_by_idx:
+        return
+    _jobs.update_one(
+        {"_id": job_id},
+        {"$set": {**{f"files.{i}.{k}": v for i, fields in fields_by_idx.items() for k, v in fields.items()},
+                  "updated_at": _now()}},
+    )
+
+def finish_job(job_id: str, status: str, error: Optional[str] = None):
+    _jobs.update_one(
+        {"_id": job_id},
+        {"$set": {"status": status, "error": error, "lease_until": None, "updated_at": _now()}},
+    )
+
+def get_job(job_id: str) -> Optional[dict]:
+    return _jobs.find_one({"_id": job_id})
+
+def find_active_job_by_hash(user_email: str, project_id: str, content_hash: str) -> Optional[dict]:
+    """A queued or running job of the project that still has to index a file with these bytes."""
+    return _jobs.find_one(
+        {"user_email": user_email.lower(), "project_id": project_id, "status": {"$in": list(ACTIVE)},
+         "files": {"$elemMatch": {"content_hash": content_hash, "state": {"$nin": ["done", "error"]}}}},
+        {"_id": 1},
+    )
+
+def list_jobs(user_email: str, project_id: str, limit: int = 5):
+    return list(
+        _jobs.find({"user_email": user_email.lower(), "project_id": project_id},
+                   {"files.analysis": 0, "files.head": 0})
+             .sort("created_at", -1)
+             .limit(limit)
+    )
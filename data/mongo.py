@@ -0,0 +1,194 @@
+# data/mongo.py
+import os
+import sys
+import logging
+import importlib
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import MongoClient, DESCENDING, monitoring
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/wonder_ai")
+DB_NAME = os.getenv("DB_NAME", "wonder_ai")
+
+# Connection pool tuning (one pool per process, shared by every collection)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+
+# Modules that register migrations; imported by migrate() so every one is seen
+_MIGRATION_MODULES = ("auth.db", "data.projects", "data.documents", "data.ingest_jobs", "data.versions",
+                      "data.code_store", "auth.tokens")
+
+_client = None
+_client_lock = threading.Lock()
+_migrations: List[Tuple[str, Callable[[], None]]] = []
+_migrate_lock = threading.Lock()
+_migrated = False
+# Guards _migrate_started only; never held while migrate() runs, so renders don't wait
+_start_lock = threading.Lock()
+_migrate_started = False
+# Set MONGO_AUTO_MIGRATE=0 to only migrate via `python -m data.mongo migrate`
+_AUTO_MIGRATE = os.getenv("MONGO_AUTO_MIGRATE", "1") != "0"
+
+class _PoolMetrics(monitoring.ConnectionPoolListener):
+    """Counts pool events; read with pool_metrics()."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {
+            "created": 0, "closed": 0, "checked_out": 0, "checked_in": 0,
+            "checkout_failed": 0, "pools_cleared": 0,
+        }
+
+    def _inc(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): self._inc("pools_cleared")
+    def pool_closed(self, event): pass
+    def connection_created(self, event): self._inc("created")
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): self._inc("closed")
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): self._inc("checkout_failed")
+    def connection_checked_out(self, event): self._inc("checked_out")
+    def connection_checked_in(self, event): self._inc("checked_in")
+
+_metrics = _PoolMetrics()
+
+def get_client() -> MongoClient:
+    """Process-wide client, created on first use (MongoClient connects lazily too)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGO_URI,
+                    serverSelectionTimeoutMS=4000,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+                    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                    event_listeners=[_metrics],
+                )
+    return _client
+
+def get_db():
+    return get_client()[DB_NAME]
+
+class LazyCollection:
+    """Module-level stand-in for a collection; resolves through the shared client
+    on first attribute access, so importing a data module does no I/O.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+def collection(name: str) -> LazyCollection:
+    return LazyCollection(name)
+
+def keyset_page(coll, filt: dict, projection: dict, limit: int, cursor: Optional[str] = None,
+                field: str = "updated_at") -> Tuple[List[dict], Optional[str]]:
+    """One page of ``coll`` newest-first by ``field`` (ties broken by _id), continuing
+    after ``cursor``. Seeks through the index instead of skipping, so every page costs
+    the same. Returns (docs, cursor for the next page or None).
+    """
+    if cursor:
+        ts, _, oid = cursor.partition("|")
+        ts, oid = datetime.fromisoformat(ts), ObjectId(oid)
+        filt = {"$and": [filt, {"$or": [{field: {"$lt": ts}}, {field: ts, "_id": {"$lt": oid}}]}]}
+    docs = list(coll.find(filt, {**projection, field: 1})
+                    .sort([(field, DESCENDING), ("_id", DESCENDING)])
+                    .limit(limit + 1))
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, f"{last[field].isoformat()}|{last['_id']}"
+
+def pool_metrics() -> Dict[str, int]:
+    """Connection pool counters for this process, plus connections currently in use/open."""
+    with _metrics._lock:
+        m = dict(_metrics.counts)
+    m["in_use"] = m["checked_out"] - m["checked_in"]
+    m["open"] = m["created"] - m["closed"]
+    m["max_pool_size"] = MONGO_MAX_POOL_SIZE
+    return m
+
+def register_migration(name: str, fn: Callable[[], None]):
+    """Register an idempotent index/cleanup task; it runs once per database via migrate().
+    Bump the name (e.g. ``...:v2``) to make a changed task run again.
+    """
+    if all(n != name for n, _ in _migrations):
+        _migrations.append((name, fn))
+
+def migrate(force: bool = False) -> List[str]:
+    """Apply registered migrations not yet recorded in the ``_migrations`` collection.
+    Returns the names that ran.
+    """
+    global _migrated
+    with _migrate_lock:
+        if _migrated and not force:
+            return []
+        for mod in _MIGRATION_MODULES:
+            importlib.import_module(mod)
+        done_coll = get_db()["_migrations"]
+        applied = {d["_id"] for d in done_coll.find({}, {"_id": 1})}
+        ran = []
+        for name, fn in _migrations:
+            if name in applied and not force:
+                continue
+            logger.info(f"Applying migration {name}")
+            fn()
+            done_coll.update_one({"_id": name}, {"$set": {"applied_at": datetime.utcnow()}}, upsert=True)
+            ran.append(name)
+        _migrated = True
+        return ran
+
+def start_migrate():
+    """Run migrate() on a background thread so it never delays the first page render.
+    One attempt at a time; after a failure (e.g. Mongo not reachable yet) the next
+    call tries again, until one succeeds.
+    """
+    global _migrate_started
+    if not _AUTO_MIGRATE or _migrated:
+        return
+    with _start_lock:
+        if _migrate_started:
+            return
+        _migrate_started = True
+
+    def _run():
+        global _migrate_started
+        try:
+            migrate()
+        except Exception as e:
+            logger.warning(f"Database migration failed, retrying on next start_migrate(): {e}")
+            with _start_lock:
+                _migrate_started = False
+    threading.Thread(target=_run, name="mongo-migrate", daemon=True).start()
+
+if __name__ == "__main__":
+    # python -m data.mongo [migrate|metrics] [--force]
+    # Registrations land in the importable module, not in __main__
+    from data.mongo import migrate, pool_metrics, get_db
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    logging.basicConfig(level=logging.INFO)
+    if cmd == "migrate":
+        ran = migrate(force="--force" in sys.argv)
+        print("Applied: " + (", ".join(ran) if ran else "nothing (up to date)"))
+    elif cmd == "metrics":
+        get_db().command("ping")
+        print(pool_metrics())
+    else:
+        sys.exit(f"Unknown command: {cmd}")
@@ -0,0 +1,137 @@
+# data/project_cache.py
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+# Cached projects are served without any DB access for this long; after that one
+# tiny {rev} read confirms the entry is still current (writes in other processes)
+PROJECT_CACHE_TTL_S = float(os.getenv("PROJECT_CACHE_TTL_S", "30"))
+PROJECT_CACHE_MAX = int(os.getenv("PROJECT_CACHE_MAX", "256"))
+# Generated code can run to megabytes per project, so the cache is bounded by size too
+PROJECT_CACHE_MAX_MB = int(os.getenv("PROJECT_CACHE_MAX_MB", "64"))
+
+_Key = Tuple[str, str]
+_NOT_LOADED = object()
+
+def _approx_size(obj: Any) -> int:
+    """Rough in-memory footprint in bytes; strings and binaries dominate."""
+    if isinstance(obj, (str, bytes)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(_approx_size(k) + _approx_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sum(_approx_size(v) for v in obj)
+    return 8
+
+class _Entry:
+    __slots__ = ("doc", "rev", "checked", "code", "nbytes")
+
+    def __init__(self, doc: dict, code: Any = _NOT_LOADED):
+        self.doc = doc
+        self.rev = doc.get("rev")
+        self.checked = time.monotonic()
+        self.code = code  # unpacked code, filled on first project_code()
+        self.nbytes = _approx_size(doc) + (_approx_size(code) if code is not _NOT_LOADED else 0)
+
+class ProjectCache:
+    """Process-wide read-through cache of project documents (without their code),
+    keyed by (user_email, project_id) and versioned by the project's ``rev`` counter,
+    which every write through data.projects increments. The unpacked code is kept
+    beside the document, loaded only for callers that ask for it.
+    """
+    def __init__(self, ttl: float = PROJECT_CACHE_TTL_S, max_entries: int = PROJECT_CACHE_MAX,
+                 max_bytes: int = PROJECT_CACHE_MAX_MB * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[_Key, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: _Key, load: Callable[[], Optional[dict]],
+            current_rev: Callable[[], Any]) -> Optional[dict]:
+        """Cached document (a copy), revalidated with ``current_rev`` once the TTL has
+        passed and reloaded with ``load`` when missing or stale.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+        if entry and time.monotonic() - entry.checked >= self.ttl:
+            if current_rev() == entry.rev:
+                entry.checked = time.monotonic()
+            else:
+                entry = None
+        if entry is None:
+            doc = load()
+            if doc is None:
+                self.invalidate(key)
+                return None
+            entry = self._put(key, doc)
+        return copy.deepcopy(entry.doc)
+
+    def _put(self, key: _Key, doc: dict, code: Any = _NOT_LOADED) -> _Entry:
+        entry = _Entry({k: v for k, v in doc.items() if k != "code"}, code)
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+        return entry
+
+    def _pop(self, key: _Key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _evict(self):
+        # The newest entry always stays, however large
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                          or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+
+    def apply_write(self, key: _Key, written: Optional[dict], code: Any = _NOT_LOADED):
+        """Fold a write's returned document into the cached entry, with the code it
+        stored when it stored any. Only when the write is the very next rev; otherwise
+        someone else wrote in between and the entry is dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return
+        if not written or written.get("rev") != (entry.rev or 0) + 1:
+            self.invalidate(key)
+            return
+        self._put(key, {**entry.doc, **written}, entry.code if code is _NOT_LOADED else code)
+
+    def invalidate(self, key: _Key):
+        with self._lock:
+            self._pop(key)
+
+    def code_for(self, key: _Key, rev: Any, load: Callable[[], Tuple[Any, Any]]):
+        """Unpacked code of the project at ``rev``, memoized on its cache entry.
+        ``load`` returns (current rev, unpacked code) straight from the database.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.rev == rev and entry.code is not _NOT_LOADED:
+            code = entry.code
+        else:
+            loaded_rev, code = load()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.rev == loaded_rev and entry.code is _NOT_LOADED:
+                    entry.code = code
+                    self._entries.move_to_end(key)
+                    size = _approx_size(code)
+                    entry.nbytes += size
+                    self._bytes += size
+                    self._evict()
+        # Callers may edit the dict in session state; strings themselves are shared
+        return dict(code) if isinstance(code, dict) else code
+
+project_cache = ProjectCache()
@@ -1,17 +1,38 @@
 # data/projects.py
-import os
 import uuid
+import logging
 from datetime import datetime
-from pymongo import MongoClient, ASCENDING
-from dotenv import load_dotenv
+from typing import Dict, Optional
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
 
-load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/wonder_ai")
-DB_NAME = os.getenv("DB_NAME", "wonder_ai")
+from data.mongo import collection, register_migration, keyset_page
+from data.versions import add_version
+from data.code_store import pack_code, unpack_code, is_packed, drop_code_file
+from data.project_cache import project_cache
 
-_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=4000)
-_db = _client[DB_NAME]
-_projects = _db["projects"]
+logger = logging.getLogger(__name__)
+
+_projects = collection("projects")
+
+# Reads that don't need the (possibly large) generated code
+WITHOUT_CODE = {"code": 0}
+# Writes hand back the updated document without it too
+WRITE_PROJECTION = WITHOUT_CODE
+# What the dashboard list shows
+SUMMARY_PROJECTION = {"project_id": 1, "name": 1, "status": 1, "updated_at": 1}
+
+_MISSING = object()
+
+def _key(user_email: str, project_id: str):
+    return user_email.lower(), project_id
+
+def _apply_projection(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return doc
+    if any(v for k, v in projection.items() if k != "_id"):
+        keep = {k for k, v in projection.items() if v} | ({"_id"} if projection.get("_id", 1) else set())
+        return {k: v for k, v in doc.items() if k in keep}
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
 
 def now_utc():
     return datetime.utcnow()
@@ -43,7 +64,17 @@ def _ensure_indexes():
         partialFilterExpression={"idempotency_key": {"$exists": True, "$type": "string"}},
     )
 
-_ensure_indexes()
+register_migration("projects:indexes:v1", _ensure_indexes)
+
+def _ensure_listing_index():
+    # Matches keyset_page's (updated_at, _id) sort, so dashboard pages seek and stop
+    # instead of sorting every project of the user in memory
+    _projects.create_index(
+        [("user_email", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+        name="user_updated_at_id",
+    )
+
+register_migration("projects:indexes:v2", _ensure_listing_index)
 
 def create_project(
     user_email: str,
@@ -52,6 +83,7 @@ def create_project(
     options: dict | None = None,
     project_id: str | None = None,
     idempotency_key: str | None = None,
+    projection: Optional[dict] = WRITE_PROJECTION,
 ) -> dict:
     if not idempotency_key:
         # Always generate a real key so we never write null
@@ -60,8 +92,8 @@ def create_project(
     pid = project_id or uuid.uuid4().hex[:12]
     now = now_utc()
 
-    # Upsert by (user_email, idempotency_key)
-    _projects.update_one(
+    # Upsert by (user_email, idempotency_key); one round trip returns the stored row
+    doc = _projects.find_one_and_update(
         {"user_email": user_email.lower(), "idempotency_key": idempotency_key},
         {
             "$setOnInsert": {
@@ -76,13 +108,14 @@ def create_project(
                 "created_at": now,
             },
             "$set": {"updated_at": now},
+            "$inc": {"rev": 1},
         },
         upsert=True,
+        projection=projection,
+        return_document=ReturnDocument.AFTER,
     )
-
-    return _projects.find_one(
-        {"user_email": user_email.lower(), "idempotency_key": idempotency_key}
-    )
+    project_cache.invalidate(_key(user_email, doc["project_id"]))
+    return doc
 
 def list_projects(user_email: str, limit: int = 100):
     return list(
@@ -91,19 +124,100 @@ def list_projects(user_email: str, limit: int = 100):
                  .limit(limit)
     )
 
-def get_project(user_email: str, project_id: str):
-    return _projects.find_one({"user_email": user_email.lower(), "project_id": project_id})
+def list_project_summaries(user_email: str, limit: int = 20, cursor: Optional[str] = None):
+    """Page of {project_id, name, status, updated_at}, newest first, via the
+    user_updated_at index. Returns (projects, next_cursor or None).
+    """
+    return keyset_page(_projects, {"user_email": user_email.lower()}, SUMMARY_PROJECTION, limit, cursor)
+
+def get_project(user_email: str, project_id: str, projection: Optional[dict] = None):
+    """Project document without its ``code``; read that with project_code().
+    Served from the process-wide project cache (see data.project_cache), so repeated
+    reads within a rerun, and across reruns, don't go back to Mongo.
+    """
+    filt = {"user_email": user_email.lower(), "project_id": project_id}
+
+    def current_rev():
+        doc = _projects.find_one(filt, {"rev": 1})
+        return doc.get("rev") if doc else _MISSING
+
+    doc = project_cache.get(_key(user_email, project_id), lambda: _projects.find_one(filt, WITHOUT_CODE),
+                            current_rev)
+    return _apply_projection(doc, projection) if doc is not None else None
+
+def project_code(doc: Optional[dict]) -> Optional[Dict[str, str]]:
+    """The project's code dict, read (and decompressed, or fetched from GridFS) only
+    now, and then kept with the cached project until it changes.
+    """
+    if not doc or "user_email" not in doc or "project_id" not in doc:
+        return unpack_code((doc or {}).get("code"))
+    filt = {"user_email": doc["user_email"].lower(), "project_id": doc["project_id"]}
 
-def update_project(user_email: str, project_id: str, updates: dict):
-    updates["updated_at"] = now_utc()
-    _projects.update_one(
+    def load():
+        for _ in range(2):
+            row = _projects.find_one(filt, {"code": 1, "rev": 1})
+            if row is None:
+                return _MISSING, None
+            code = unpack_code(row.get("code"))
+            # None for packed code means its GridFS file was replaced by a newer save
+            # between the two reads; the second pass sees that save
+            if code is not None or not is_packed(row.get("code")):
+                break
+        return row.get("rev"), code
+
+    return project_cache.code_for(_key(doc["user_email"], doc["project_id"]), doc.get("rev"), load)
+
+def update_project(user_email: str, project_id: str, updates: dict, projection: Optional[dict] = WRITE_PROJECTION):
+    """Apply ``updates`` and return the document as written, atomically in one round trip."""
+    doc = _projects.find_one_and_update(
         {"user_email": user_email.lower(), "project_id": project_id},
-        {"$set": updates}
+        {"$set": {**updates, "updated_at": now_utc()}, "$inc": {"rev": 1}},
+        projection=projection,
+        return_document=ReturnDocument.AFTER,
     )
-    return get_project(user_email, project_id)
+    if "code" in updates:
+        project_cache.invalidate(_key(user_email, project_id))
+    else:
+        project_cache.apply_write(_key(user_email, project_id), doc)
+    return doc
 
-def save_generation(user_email: str, project_id: str, prompt: str, options: dict, code: dict, preview_url: str | None):
-    return update_project(
-        user_email, project_id,
-        {"prompt": prompt, "options": options, "code": code, "preview_url": preview_url, "status": "generated"}
+def save_generation(user_email: str, project_id: str, prompt: str, options: dict, code: dict, preview_url: str | None,
+                    projection: Optional[dict] = WRITE_PROJECTION, kind: str = "generation"):
+    """Store ``code`` as the project's current code and append it to its version history
+    (see data.versions). ``kind`` is "generation" or "modification". Large code is
+    stored compressed or in GridFS (see data.code_store).
+    """
+    stored = pack_code(user_email, project_id, code)
+    new_file = stored.get("file_id") if is_packed(stored) else None
+    updates = {"prompt": prompt, "options": options, "code": stored, "code_file_id": new_file,
+               "preview_url": preview_url, "status": "generated", "updated_at": now_utc()}
+    # The pre-image tells us exactly which GridFS file this save replaced; the post-image
+    # is that plus our own $set/$inc, so it is rebuilt locally instead of read back
+    before_projection = projection
+    if projection and any(v for k, v in projection.items() if k != "_id"):
+        before_projection = {**projection, "rev": 1, "version_seq": 1, "code_file_id": 1}
+    # Same round trip also takes the next version number
+    before = _projects.find_one_and_update(
+        {"user_email": user_email.lower(), "project_id": project_id},
+        {"$set": updates, "$inc": {"version_seq": 1, "rev": 1}},
+        projection=before_projection,
+        return_document=ReturnDocument.BEFORE,
     )
+    if before is None:
+        project_cache.invalidate(_key(user_email, project_id))
+        if new_file is not None:
+            drop_code_file(new_file)
+        return None
+    old_file = before.get("code_file_id")
+    seq = (before.get("version_seq") or 0) + 1
+    after = {**before, **updates, "version_seq": seq, "rev": (before.get("rev") or 0) + 1}
+    project_cache.apply_write(_key(user_email, project_id), after, code=dict(code) if code else code)
+    doc = _apply_projection(after, projection)
+    if old_file is not None and old_file != new_file:
+        drop_code_file(old_file)
+    try:
+        add_version(user_email, project_id, seq, code, prompt=prompt, options=options, kind=kind)
+    except Exception as e:
+        # History is best effort; the project itself already holds the new code
+        logger.warning(f"Could not record version {seq} of project {project_id}: {e}")
+    return doc
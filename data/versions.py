@@ -0,0 +1,94 @@
+# data/versions.py
+import os
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+from bson import Binary
+from pymongo import ASCENDING, DESCENDING
+
+from data.mongo import collection, register_migration
+from data.compression import compress, decompress
+
+# Every Nth version is stored whole, so rebuilding any version decodes at most N blobs
+SNAPSHOT_EVERY = int(os.getenv("VERSION_SNAPSHOT_EVERY", "10"))
+
+_versions = collection("project_versions")
+
+def _ensure_indexes():
+    _versions.create_index(
+        [("user_email", ASCENDING), ("project_id", ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+        name="uniq_user_project_seq",
+    )
+
+register_migration("project_versions:indexes:v1", _ensure_indexes)
+
+# Everything but the payload, for history listings
+_SUMMARY_PROJECTION = {"blob": 0, "_id": 0}
+
+def _now():
+    return datetime.utcnow()
+
+def _serialize(code: dict) -> bytes:
+    return json.dumps(code or {}, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+def _rebuild(chain: List[dict]) -> bytes:
+    """Decode a snapshot followed by its deltas, in seq order."""
+    data = None
+    for v in chain:
+        data = decompress(v["codec"], v["blob"], None if v["snapshot"] else data)
+    return data
+
+def _load_bytes(user_email: str, project_id: str, seq: int) -> Optional[bytes]:
+    q = {"user_email": user_email.lower(), "project_id": project_id}
+    snap = _versions.find_one({**q, "seq": {"$lte": seq}, "snapshot": True}, {"seq": 1},
+                              sort=[("seq", DESCENDING)])
+    if not snap:
+        return None
+    chain = list(_versions.find({**q, "seq": {"$gte": snap["seq"], "$lte": seq}}).sort("seq", ASCENDING))
+    # A gap (a writer that never finished) makes the chain unusable
+    if not chain or chain[-1]["seq"] != seq or len(chain) != seq - snap["seq"] + 1:
+        return None
+    return _rebuild(chain)
+
+def add_version(user_email: str, project_id: str, seq: int, code: dict, prompt: str = "",
+                options: Optional[dict] = None, kind: str = "generation"):
+    """Record ``code`` as version ``seq`` (1-based, taken from the project's atomic
+    version_seq counter by the caller). Stored as a compressed delta against version
+    seq-1, or as a full snapshot every SNAPSHOT_EVERY versions and whenever the
+    parent can't be rebuilt.
+    """
+    data = _serialize(code)
+    base = None
+    if (seq - 1) % SNAPSHOT_EVERY:
+        base = _load_bytes(user_email, project_id, seq - 1)
+    codec, blob = compress(data, base)
+    doc = {
+        "user_email": user_email.lower(),
+        "project_id": project_id,
+        "seq": seq,
+        "parent": seq - 1 if seq > 1 else None,
+        "kind": kind,
+        "snapshot": base is None,
+        "codec": codec,
+        "blob": Binary(blob),
+        "size": len(data),
+        "stored_size": len(blob),
+        "prompt": prompt or "",
+        "options": options or {},
+        "created_at": _now(),
+    }
+    _versions.insert_one(doc)
+
+def get_version_code(user_email: str, project_id: str, seq: int) -> Optional[Dict[str, str]]:
+    """The code dict as of version ``seq``, or None if it doesn't exist."""
+    data = _load_bytes(user_email, project_id, seq)
+    return json.loads(data.decode("utf-8")) if data is not None else None
+
+def list_versions(user_email: str, project_id: str, limit: int = 50) -> List[dict]:
+    """Newest-first version metadata (seq, kind, prompt, sizes, created_at), without payloads."""
+    return list(
+        _versions.find({"user_email": user_email.lower(), "project_id": project_id}, _SUMMARY_PROJECTION)
+                 .sort("seq", DESCENDING)
+                 .limit(limit)
+    )
@@ -45,6 +45,7 @@ def generate_website(prompt, options):
     merged_options = {
         **(options or {}),
         "thread_id": st.session_state.thread_id,
+        "project_id": st.session_state.get("current_project_id"),
     }
 
     result = glm_client.generate_website_code_agentic(
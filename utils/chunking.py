@@ -0,0 +1,127 @@
+# utils/chunking.py
+from __future__ import annotations
+import os, re
+from typing import Iterable, Iterator, Tuple, List, Dict, Any, Callable, Optional
+
+# MiniLM truncates at 256 tokens including [CLS]/[SEP]; leave a little slack
+TARGET_TOKENS = int(os.environ.get("CHUNK_TARGET_TOKENS", "240"))
+OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "32"))
+# A page tail shorter than this is carried over and merged with the next page
+_MIN_TOKENS = TARGET_TOKENS // 4
+
+_PARA_RE = re.compile(r"\n\s*\n")
+_SENT_RE = re.compile(r"(?<=[.!?…])\s+")
+_NUMBERED_RE = re.compile(r"^(\d+(\.\d+)*|[IVX]+)[.)]?\s+\S")
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > 80 or line.endswith((".", ",", ";", ":")):
+        return False
+    if line.startswith("#"):
+        return True
+    words = line.split()
+    if len(words) > 10:
+        return False
+    if line.isupper() and any(c.isalpha() for c in line):
+        return True
+    if _NUMBERED_RE.match(line):
+        return True
+    # Title Case: most words capitalized
+    caps = sum(1 for w in words if w[:1].isupper())
+    return len(words) >= 2 and caps / len(words) >= 0.8
+
+def _blocks(text: str) -> Iterator[Tuple[str, str]]:
+    """("heading", line) / ("para", text) blocks in reading order."""
+    for para in _PARA_RE.split(text or ""):
+        lines = [l for l in para.splitlines() if l.strip()]
+        body: List[str] = []
+        for line in lines:
+            if _is_heading(line):
+                if body:
+                    yield "para", " ".join(body)
+                    body = []
+                yield "heading", line.strip().lstrip("#").strip()
+            else:
+                body.append(line.strip())
+        if body:
+            yield "para", " ".join(body)
+
+def _units(para: str, count: Callable[[str], int], target: int) -> Iterator[Tuple[str, int]]:
+    """Split a paragraph into sentence units that each fit in ``target`` tokens."""
+    n = count(para)
+    if n <= target:
+        yield para, n
+        return
+    for sent in _SENT_RE.split(para):
+        n = count(sent)
+        if n <= target:
+            yield sent, n
+            continue
+        # Run-on sentence (tables, lists without punctuation): fall back to word windows
+        words = sent.split()
+        step = max(1, int(len(words) * target / n))
+        for i in range(0, len(words), step):
+            piece = " ".join(words[i:i + step])
+            yield piece, count(piece)
+
+def default_token_counter() -> Callable[[str], int]:
+    """Token counter from the embedding model's tokenizer; ~4 chars/token if unavailable."""
+    try:
+        from utils.embeddings import Embeddings
+        return Embeddings.count_tokens
+    except Exception:
+        return lambda s: max(1, len(s) // 4)
+
+def iter_chunks(pages: Iterable[Tuple[int, str]], target_tokens: int = TARGET_TOKENS,
+                overlap_tokens: int = OVERLAP_TOKENS,
+                count_tokens: Optional[Callable[[str], int]] = None) -> Iterator[Dict[str, Any]]:
+    """Stream structure-aware chunks from (page_no, text) pairs.
+    Chunks break at headings and (unless tiny) at page ends, pack whole paragraphs
+    and sentences up to ``target_tokens`` measured with the embedder's tokenizer,
+    and repeat up to ``overlap_tokens`` of trailing sentences when a section spills
+    over. Yields {"text", "page", "page_end", "heading"}.
+    """
+    count = count_tokens or default_token_counter()
+    units: List[Tuple[str, int]] = []
+    used = 0
+    heading = ""
+    start_page = end_page = None
+
+    def emit():
+        body = " ".join(u for u, _ in units)
+        text = f"{heading}\n{body}" if heading else body
+        return {"text": text, "page": start_page, "page_end": end_page, "heading": heading}
+
+    for page_no, text in pages:
+        for kind, block in _blocks(text):
+            if kind == "heading":
+                if units:
+                    yield emit()
+                    units, used = [], 0
+                heading = block
+                continue
+            budget = target_tokens - (count(heading) if heading else 0)
+            for unit, n in _units(block, count, max(budget, 1)):
+                if units and used + n > budget:
+                    yield emit()
+                    # Carry trailing sentences forward for context across the split
+                    tail, tail_used = [], 0
+                    for u, un in reversed(units):
+                        if tail_used + un > overlap_tokens:
+                            break
+                        tail.insert(0, (u, un))
+                        tail_used += un
+                    units, used = tail, tail_used
+                    while units and used + n > budget:
+                        used -= units.pop(0)[1]
+                    start_page = page_no
+                if not units:
+                    start_page = page_no
+                units.append((unit, n))
+                used += n
+                end_page = page_no
+        if units and used >= _MIN_TOKENS:
+            yield emit()
+            units, used = [], 0
+    if units:
+        yield emit()
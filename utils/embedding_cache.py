@@ -0,0 +1,160 @@
+# utils/embedding_cache.py
+from __future__ import annotations
+import os, re, time, hashlib, sqlite3, threading, unicodedata
+from contextlib import contextmanager
+from typing import List, Optional, Dict
+import numpy as np
+
+try:
+    import fcntl  # POSIX; elsewhere keep one cache directory per process
+except ImportError:
+    fcntl = None
+
+class EmbeddingCache:
+    """Disk-backed embedding cache keyed by (model name, normalized text hash).
+    Files (one directory per model):
+      - vectors.f32 (fixed-capacity float32 slot array, memory-mapped)
+      - index.sqlite (key -> slot, last_used for LRU eviction)
+      - lock (flock: shared while reading slots, exclusive while (re)writing them)
+    The directory is shared by the app and the ingest worker processes, so slot
+    allocation runs in a BEGIN IMMEDIATE transaction under the exclusive lock, and
+    readers hold the shared lock so no slot is rewritten while they copy it out.
+    """
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 100_000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.dir = os.path.join(cache_dir, slug)
+        os.makedirs(self.dir, exist_ok=True)
+        self.vec_path = os.path.join(self.dir, "vectors.f32")
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(self.dir, "lock"), "a+")
+        self._db = sqlite3.connect(os.path.join(self.dir, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (k TEXT PRIMARY KEY, v TEXT)")
+        self._db.commit()
+        row = self._db.execute("SELECT v FROM info WHERE k='dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+        self._vecs: Optional[np.memmap] = None
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Thread lock plus the cross-process flock on the cache directory."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+    def key(self, text: str) -> str:
+        h = hashlib.sha1()
+        h.update(self.model_name.encode("utf-8"))
+        h.update(b"\0")
+        h.update(self.normalize(text).encode("utf-8"))
+        return h.hexdigest()
+
+    def _open_vectors(self, dim: int) -> np.memmap:
+        if self._vecs is None:
+            if self.dim is None:
+                # First writer wins if another process set it meanwhile
+                self._db.execute("INSERT OR IGNORE INTO info (k, v) VALUES ('dim', ?)", (str(dim),))
+                self._db.commit()
+                self.dim = int(self._db.execute("SELECT v FROM info WHERE k='dim'").fetchone()[0])
+            size = self.max_entries * self.dim * 4
+            if not os.path.exists(self.vec_path) or os.path.getsize(self.vec_path) < size:
+                # Sparse on most filesystems: only written slots take disk space
+                with open(self.vec_path, "ab") as f:
+                    f.truncate(size)
+            self._vecs = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(self.max_entries, self.dim))
+        return self._vecs
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector per text, or None for a miss. Hits are marked recently used."""
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        if self.dim is None or not texts:
+            return out
+        keys = [self.key(t) for t in texts]
+        with self._locked(exclusive=False):
+            vecs = self._open_vectors(self.dim)
+            slots: Dict[str, int] = {}
+            uniq = list(set(keys))
+            for start in range(0, len(uniq), 500):
+                part = uniq[start:start + 500]
+                q = f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                slots.update(self._db.execute(q, part).fetchall())
+            if slots:
+                now = time.time()
+                self._db.executemany("UPDATE entries SET last_used=? WHERE key=?", [(now, k) for k in slots])
+                self._db.commit()
+            for i, k in enumerate(keys):
+                if k in slots:
+                    out[i] = np.array(vecs[slots[k]])
+        return out
+
+    def put_many(self, texts: List[str], embs: np.ndarray):
+        """Store vectors for texts (misses only), evicting least-recently-used slots when full."""
+        if not texts:
+            return
+        embs = np.asarray(embs, dtype=np.float32)
+        if self.dim is not None and embs.shape[1] != self.dim:
+            return
+        pending = {}
+        for t, e in zip(texts, embs):
+            pending[self.key(t)] = e
+        with self._locked(exclusive=True):
+            vecs = self._open_vectors(embs.shape[1])
+            if self.dim != embs.shape[1]:
+                return
+            # Write transaction: allocation below sees every other process's inserts
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Another caller may have stored some of these since our lookup
+                keys = list(pending)
+                for start in range(0, len(keys), 500):
+                    part = keys[start:start + 500]
+                    q = f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                    for (k,) in self._db.execute(q, part).fetchall():
+                        pending.pop(k, None)
+                if not pending:
+                    self._db.rollback()
+                    return
+                # Slots are handed out densely (0..used-1) and evictions are always reused
+                (used,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+                free = self.max_entries - used
+                need = max(0, len(pending) - free)
+                reuse = []
+                if need:
+                    reuse = [r[0] for r in self._db.execute(
+                        "SELECT slot FROM entries ORDER BY last_used LIMIT ?", (need,)).fetchall()]
+                    self._db.executemany("DELETE FROM entries WHERE slot=?", [(s,) for s in reuse])
+                next_slot = used
+                now = time.time()
+                rows = []
+                for k, e in list(pending.items())[:self.max_entries]:
+                    if reuse:
+                        slot = reuse.pop()
+                    else:
+                        slot = next_slot
+                        next_slot += 1
+                        if slot >= self.max_entries:
+                            break
+                    rows.append((k, slot, now))
+                # Rows first, then vectors: a failure before commit leaves no key pointing at them
+                self._db.executemany("INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)", rows)
+                for k, slot, _ in rows:
+                    vecs[slot] = pending[k]
+                vecs.flush()
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
@@ -0,0 +1,96 @@
+# utils/embedding_pool.py
+from __future__ import annotations
+import os, atexit, threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+from typing import List, Optional, Tuple
+import numpy as np
+
+from utils.embeddings import Embeddings
+
+# add_texts switches to the pool at or above this many chunks
+POOL_THRESHOLD = int(os.environ.get("EMBEDDING_POOL_THRESHOLD", "512"))
+_POOL_MAX_WORKERS = int(os.environ.get("EMBEDDING_POOL_WORKERS", "4"))
+_MIN_SHARD = 64
+
+def _init_worker(threads: int):
+    # Split cores between workers instead of every process grabbing all of them
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["ONNX_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    Embeddings._get_model()
+
+def _encode_shard(texts: List[str]) -> Tuple[str, Tuple[int, int]]:
+    # Hand the result back through shared memory; only the name and shape are pickled
+    embs = np.ascontiguousarray(Embeddings._encode(texts), dtype=np.float32)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, embs.nbytes))
+    np.ndarray(embs.shape, dtype=np.float32, buffer=shm.buf)[:] = embs
+    # The parent owns the segment from here on and unlinks it after copying
+    resource_tracker.unregister(shm._name, "shared_memory")
+    name = shm.name
+    shm.close()
+    return name, embs.shape
+
+class EmbeddingPool:
+    """Process pool for bulk embedding: one model per worker, input sharded across
+    workers, results returned via shared memory. Cache lookups stay in the parent.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_workers: Optional[int] = None):
+        cores = os.cpu_count() or 1
+        self.workers = max(1, min(max_workers or _POOL_MAX_WORKERS, cores))
+        threads = max(1, cores // self.workers)
+        # spawn: torch / tokenizers are not fork-safe once initialized
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        )
+
+    @classmethod
+    def instance(cls) -> "EmbeddingPool":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                atexit.register(cls._instance.shutdown)
+            return cls._instance
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return Embeddings.embed(texts, encoder=self._encode_parallel)
+
+    def _encode_parallel(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return Embeddings._encode(texts)
+        shard = max(_MIN_SHARD, -(-len(texts) // self.workers))
+        futures = [self._executor.submit(_encode_shard, texts[i:i + shard]) for i in range(0, len(texts), shard)]
+        parts = []
+        error = None
+        for fut in futures:
+            # After a failure keep draining: segments of the shards that did finish are
+            # untracked (see _encode_shard) and would stay in /dev/shm unless unlinked here
+            try:
+                name, shape = fut.result()
+            except Exception as e:
+                error = error or e
+                continue
+            shm = shared_memory.SharedMemory(name=name)
+            try:
+                if error is None:
+                    parts.append(np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy())
+            finally:
+                shm.close()
+                shm.unlink()
+        if error is not None:
+            raise error
+        return np.vstack(parts)
@@ -0,0 +1,108 @@
+# utils/embedding_service.py
+from __future__ import annotations
+import os, queue, threading, time
+from concurrent.futures import Future
+from typing import List, Optional
+import numpy as np
+
+from utils.embeddings import Embeddings
+
+_MAX_BATCH = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_MAX_WAIT_MS", "10"))
+
+class _Request:
+    """One submit() call; large inputs are split into segments that may land in different batches."""
+    def __init__(self, n_segments: int):
+        self.future: Future = Future()
+        self._parts: List[Optional[np.ndarray]] = [None] * n_segments
+        self._remaining = n_segments
+        self._lock = threading.Lock()
+
+    def deliver(self, idx: int, embs: np.ndarray):
+        with self._lock:
+            self._parts[idx] = embs
+            self._remaining -= 1
+            done = self._remaining == 0
+        if done and not self.future.done():
+            self.future.set_result(np.vstack(self._parts))
+
+    def fail(self, exc: BaseException):
+        with self._lock:
+            if not self.future.done():
+                self.future.set_exception(exc)
+
+class _Segment:
+    __slots__ = ("request", "idx", "texts")
+
+    def __init__(self, request: _Request, idx: int, texts: List[str]):
+        self.request = request
+        self.idx = idx
+        self.texts = texts
+
+class EmbeddingService:
+    """Process-wide embedding worker thread.
+    Requests from any session are queued and coalesced into micro-batches of up to
+    ``max_batch`` texts, waiting at most ``max_wait_ms`` after the first one arrives.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_batch: int = _MAX_BATCH, max_wait_ms: float = _MAX_WAIT_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_Segment]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def instance(cls) -> "EmbeddingService":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for embedding; the future resolves to an (n, dim) float32 array."""
+        texts = list(texts)
+        if not texts:
+            fut: Future = Future()
+            fut.set_result(Embeddings.embed(texts))
+            return fut
+        starts = range(0, len(texts), self.max_batch)
+        req = _Request(len(starts))
+        for i, start in enumerate(starts):
+            self._queue.put(_Segment(req, i, texts[start:start + self.max_batch]))
+        return req.future
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(texts).result(timeout=timeout)
+
+    def _run(self):
+        while True:
+            seg = self._queue.get()
+            batch = [seg]
+            n = len(seg.texts)
+            deadline = time.monotonic() + self.max_wait
+            while n < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(nxt)
+                n += len(nxt.texts)
+
+            texts = [t for s in batch for t in s.texts]
+            try:
+                embs = Embeddings.embed(texts)
+            except Exception as e:
+                for s in batch:
+                    s.request.fail(e)
+                continue
+            off = 0
+            for s in batch:
+                s.request.deliver(s.idx, embs[off:off + len(s.texts)])
+                off += len(s.texts)
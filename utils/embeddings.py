@@ -1,26 +1,92 @@
 # utils/embeddings.py
 import os
-from typing import List
+import copy
+import threading
+from typing import List, Callable, Optional
 import numpy as np
 
-# Prefer sentence-transformers locally for reliability
-# (Works offline once the model is cached.)
-from sentence_transformers import SentenceTransformer
+from utils.embedding_cache import EmbeddingCache
 
 _DEFAULT_MODEL = os.environ.get("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
 
+# "torch" (sentence-transformers) or "onnx" (int8-quantized ONNX Runtime, CPU only)
+_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch").lower()
+_ONNX_DIR = os.environ.get("EMBEDDING_ONNX_DIR", "./models/all-MiniLM-L6-v2-onnx-int8")
+
+# Persistent (model, text-hash) -> vector cache; set EMBEDDING_CACHE=0 to disable
+_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE", "1") != "0"
+_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "./.embedding_cache")
+_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
 class Embeddings:
     _model = None
+    _cache = None
+    _counter = None
+    _model_lock = threading.Lock()
+    _counter_lock = threading.Lock()
 
     @classmethod
     def _get_model(cls):
-        if cls._model is None:
-            cls._model = SentenceTransformer(_DEFAULT_MODEL)
+        if cls._model is not None:
+            return cls._model
+        # Warm-up thread and first real caller may race; load exactly once
+        with cls._model_lock:
+            if cls._model is None:
+                if _BACKEND == "onnx":
+                    from utils.onnx_embedder import OnnxEmbedder
+                    cls._model = OnnxEmbedder(_ONNX_DIR, _DEFAULT_MODEL)
+                else:
+                    # Prefer sentence-transformers locally for reliability
+                    # (Works offline once the model is cached.)
+                    from sentence_transformers import SentenceTransformer
+                    cls._model = SentenceTransformer(_DEFAULT_MODEL)
         return cls._model
 
     @classmethod
-    def embed(cls, texts: List[str]) -> np.ndarray:
+    def count_tokens(cls, text: str) -> int:
+        """Length of ``text`` in the embedding model's tokens (no truncation, no specials)."""
+        model = cls._get_model()
+        if _BACKEND == "onnx":
+            return model.count_tokens(text)
+        # Calls with truncation=False reconfigure the Rust tokenizer, so counting uses
+        # its own copy (one caller at a time), never the one encode() runs on
+        with cls._counter_lock:
+            if cls._counter is None:
+                cls._counter = copy.deepcopy(model.tokenizer)
+            return len(cls._counter(text, add_special_tokens=False, truncation=False)["input_ids"])
+
+    @classmethod
+    def _get_cache(cls):
+        if cls._cache is None and _CACHE_ENABLED:
+            # Quantized vectors differ slightly, so each backend gets its own cache
+            name = _DEFAULT_MODEL if _BACKEND != "onnx" else f"{_DEFAULT_MODEL}@onnx-int8"
+            cls._cache = EmbeddingCache(_CACHE_DIR, name, max_entries=_CACHE_MAX_ENTRIES)
+        return cls._cache
+
+    @classmethod
+    def _encode(cls, texts: List[str]) -> np.ndarray:
         model = cls._get_model()
+        if _BACKEND == "onnx":
+            return model.encode(texts)
         # Normalize embeddings for cosine similarity in FAISS
-        embs = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
-        return embs
+        return model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+    @classmethod
+    def embed(cls, texts: List[str], encoder: Optional[Callable[[List[str]], np.ndarray]] = None) -> np.ndarray:
+        """Normalized embeddings for ``texts``; cache misses go to ``encoder``
+        (defaults to the in-process model, EmbeddingPool passes its workers).
+        """
+        encoder = encoder or cls._encode
+        cache = cls._get_cache()
+        if cache is None or not texts:
+            return encoder(texts)
+
+        cached = cache.get_many(texts)
+        # Encode each distinct missing text once, in one batch
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        if not missing:
+            return np.stack(cached).astype(np.float32)
+        fresh = encoder(missing)
+        cache.put_many(missing, fresh)
+        by_text = dict(zip(missing, fresh))
+        return np.stack([v if v is not None else by_text[t] for t, v in zip(texts, cached)]).astype(np.float32)
@@ -13,12 +13,20 @@ from langgraph.checkpoint.memory import MemorySaver
 from typing import Callable, Optional, Any, Dict, List, TypedDict
 from openai import APITimeoutError, APIConnectionError, APIError, RateLimitError
 
+from utils.retrieval import (
+    GATHER_CONTEXT_TOKENS, CODEGEN_CONTEXT_TOKENS, merge_hits, dedupe_hits, pack_snippets,
+)
+
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Document analyses in flight at once, and the per-request timeout for each
+ANALYSIS_CONCURRENCY = int(os.environ.get("ANALYSIS_CONCURRENCY", "4"))
+ANALYSIS_TIMEOUT = int(os.environ.get("ANALYSIS_TIMEOUT", "120"))
+
 
 class BuildState(TypedDict, total=False):
     user_prompt: str
@@ -63,8 +71,9 @@ class GLMClient:
         # You can override with env HF_IMAGE_MODEL
         self.image_model = os.environ.get("HF_IMAGE_MODEL", "stabilityai/stable-diffusion-xl-base-1.0")
 
-        # Optional: attach your own vector client externally (e.g., Qdrant)
-        self.vector_client = None  # set to your Qdrant client elsewhere
+        # Project vector store (ProjectVectorStore) used for retrieval in _node_gather;
+        # set from options["project_id"] per build, or attach one externally.
+        self.vector_client = None
 
         # Local assets directory for storing generated images/files
         self.assets_dir = os.environ.get("ASSETS_DIR", "./assets")
@@ -76,7 +85,7 @@ class GLMClient:
 
     # -------------------- Core LLM call --------------------
 
-    def chat_completion(self, messages, temperature=1, max_tokens=4000):
+    def chat_completion(self, messages, temperature=1, max_tokens=4000, timeout=300):
         """
         Chat completion with retry logic for handling timeouts and gateway errors
         """
@@ -102,7 +111,7 @@ class GLMClient:
                     messages=messages,
                     temperature=temperature,
                     max_tokens=max_tokens,
-                    timeout=300  # Keep your original timeout
+                    timeout=timeout
                 )
                 
                 response = completion.choices[0].message.content
@@ -218,6 +227,14 @@ class GLMClient:
           plan, requirements, images, code, modified_code, selectors
         """
         self._ui_hook = ui_hook
+        project_id = (options or {}).get("project_id")
+        if project_id:
+            try:
+                from utils.vector_store import ProjectVectorStore
+                self.vector_client = ProjectVectorStore.for_project(project_id)
+            except Exception as e:
+                logger.warning(f"Vector store unavailable for project {project_id}: {e}")
+                self.vector_client = None
         initial_state: BuildState = {
             "user_prompt": prompt,
             "options": options or {},
@@ -288,18 +305,25 @@ class GLMClient:
 
     def vector_search(self, query: str, top_k: int = 6) -> List[str]:
         """
-        Replace this with your Qdrant/FAISS/Chroma search.
+        Search the attached project store for document chunks.
         Expected return: List[str] chunk texts (concise).
         """
-        if self.vector_client is None:
+        return self.retrieve_context([query], top_k=top_k, budget_tokens=GATHER_CONTEXT_TOKENS)
+
+    def retrieve_context(self, queries: List[str], top_k: int = 6, budget_tokens: int = GATHER_CONTEXT_TOKENS) -> List[str]:
+        """
+        Batched retrieval over uploaded documents: merge hits across queries,
+        drop near-duplicate chunks and pack the best ones into a token budget.
+        """
+        if self.vector_client is None or not queries:
             return []
         try:
-            # Example for Qdrant client (pseudo-code):
-            # result = self.vector_client.query(collection_name="site_docs", query_text=query, limit=top_k)
-            # return [hit["payload"]["text"] for hit in result]
-            return []
-        except Exception:
+            per_query = self.vector_client.search_many(queries, k=top_k, where={"type": "doc"})
+        except Exception as e:
+            logger.warning(f"Vector search failed: {e}")
             return []
+        hits = dedupe_hits(merge_hits(per_query))
+        return pack_snippets([h["text"] for h in hits], budget_tokens)
 
     def image_generation(self, prompt: str, n: int = 1, size: str = "1024x1024") -> List[Dict[str, str]]:
         """
@@ -469,7 +493,13 @@ class GLMClient:
 
     def _node_gather(self, state: BuildState) -> BuildState:
         q = f"Website content ideas, copy, facts, and structure for: {state['user_prompt']}"
-        hits = self.vector_search(q, top_k=8) or []
+        # One query for the whole site plus one per sitemap section
+        queries = [q]
+        for sec in (state.get("requirements", {}).get("sitemap") or [])[:8]:
+            if isinstance(sec, dict):
+                sec = sec.get("title") or sec.get("name") or sec.get("id") or json.dumps(sec, ensure_ascii=False)
+            queries.append(f"{sec}: {state['user_prompt']}")
+        hits = self.retrieve_context(queries, top_k=6, budget_tokens=GATHER_CONTEXT_TOKENS)
         state["docs_context"] = hits
 
         sys = (
@@ -569,7 +599,8 @@ class GLMClient:
             assets_text = "Assets (use placeholders; alt in parentheses):\n" + "\n".join([f"- {{ASSET_{i}}} ({img.get('alt','')})" for i, img in enumerate(state["images"])])
 
         copy_text = json.dumps(state["requirements"].get("copy_deck", []), indent=2)
-        docs_text = "\n".join(state.get("docs_context", [])[:10])
+        # docs_context is already ranked by relevance; re-pack for this stage's budget
+        docs_text = "\n\n".join(pack_snippets(state.get("docs_context", []), CODEGEN_CONTEXT_TOKENS))
 
         full_prompt = f"""{state['user_prompt']}
 
@@ -793,27 +824,12 @@ class GLMClient:
 
             CONTENT START\n\n""" + text[:8000] + "\n\nCONTENT END").strip()
 
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
         try:
-
-            resp = self.client.chat.completions.create(
-
-                model=self.model,  # same model as rest of app
-
-                messages=[
-
-                    {"role": "system", "content": system},
-
-                    {"role": "user", "content": user},
-
-                ],
-
-                temperature=0.3,
-
-            )
-
-            return resp.choices[0].message.content if resp and resp.choices else ""
-
+            # Same retry/backoff and rate-limit handling as every other LLM call
+            return self.chat_completion(messages, temperature=0.3, timeout=ANALYSIS_TIMEOUT) or ""
         except Exception as e:
-
-            return f"{{\"error\": \"{str(e)}\"}}"
-
+            return json.dumps({"error": str(e)})
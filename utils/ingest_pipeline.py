@@ -0,0 +1,103 @@
+# utils/ingest_pipeline.py
+from __future__ import annotations
+import os, hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Tuple, List, Dict, Any, Callable, Optional
+
+from utils.embedding_pool import POOL_THRESHOLD
+from utils.chunking import iter_chunks
+
+# First batch is small so a document becomes searchable quickly; later batches
+# double up to POOL_THRESHOLD so bulk files reach the multi-process pool.
+_FIRST_BATCH = int(os.environ.get("INGEST_FIRST_BATCH", "64"))
+_MAX_PENDING_BATCHES = 2
+ANALYSIS_CHARS = 6000
+
+def chunk_hash(text: str) -> str:
+    # Whitespace-insensitive, so re-extraction noise doesn't force a re-embed
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()[:16]
+
+def index_pages(store, file_name: str, pages: Iterable[Tuple[int, str]],
+                on_head: Optional[Callable[[str], None]] = None) -> Tuple[Dict[str, int], str]:
+    """Chunk (page_no, text) pairs as they stream in (see utils.chunking) and index
+    them in batches on a writer thread, so extraction of later pages overlaps
+    embedding of earlier ones. Each chunk records its source page range, heading
+    and text hash.
+    Re-ingestion is incremental: chunks whose hash already exists for this file keep
+    their stored vector (with their position, pages and heading updated), only new
+    chunks are embedded, and stale ones are deleted.
+    ``on_head`` is called once with the leading text as soon as enough of it has been
+    extracted, so LLM analysis can start while the rest of the file is embedded.
+    The read-previous / add / delete sequence holds the store's per-file lock, so two
+    jobs indexing the same file at once run one after the other instead of both
+    embedding every chunk.
+    Returns ({"chunks", "embedded", "reused", "removed"}, leading text for LLM analysis).
+    """
+    with store.file_lock(file_name):
+        return _index_pages(store, file_name, pages, on_head)
+
+def _index_pages(store, file_name: str, pages: Iterable[Tuple[int, str]],
+                 on_head: Optional[Callable[[str], None]]) -> Tuple[Dict[str, int], str]:
+    # chunk_hash -> this file's current chunks with that text
+    previous: Dict[str, List[Dict[str, Any]]] = {}
+    for rec in store.records_where({"type": "doc", "file": file_name}):
+        previous.setdefault((rec.get("metadata") or {}).get("chunk_hash"), []).append(rec)
+    # Reused chunks whose position, pages or heading moved: id -> new metadata
+    moved: Dict[str, Dict[str, Any]] = {}
+    reused = embedded = 0
+    writer = ThreadPoolExecutor(max_workers=1)
+    pending = deque()
+    batch: List[str] = []
+    metas: List[Dict[str, Any]] = []
+    head: List[str] = []
+    pos = 0
+    target = _FIRST_BATCH
+
+    def tee_head(pages):
+        # Keep the leading raw text for analyze_text while pages flow to the chunker
+        head_len = 0
+        for page_no, text in pages:
+            if head_len < ANALYSIS_CHARS:
+                head.append(text)
+                head_len += len(text)
+                if head_len >= ANALYSIS_CHARS and on_head:
+                    on_head("\n".join(head)[:ANALYSIS_CHARS])
+            yield page_no, text
+        if head_len < ANALYSIS_CHARS and on_head:
+            on_head("\n".join(head))
+
+    try:
+        for chunk in iter_chunks(tee_head(pages)):
+            h = chunk_hash(chunk["text"])
+            pos += 1
+            meta = {"type": "doc", "file": file_name, "pos": pos - 1, "page": chunk["page"],
+                    "page_end": chunk["page_end"], "heading": chunk["heading"], "chunk_hash": h}
+            if previous.get(h):
+                # Unchanged text: keep the stored vector, but the chunk may have moved
+                rec = previous[h].pop()
+                if rec.get("metadata") != meta:
+                    moved[rec["id"]] = meta
+                reused += 1
+                continue
+            batch.append(chunk["text"])
+            metas.append(meta)
+            embedded += 1
+            if len(batch) >= target:
+                pending.append(writer.submit(store.add_texts, batch, metas))
+                batch, metas = [], []
+                target = min(target * 2, POOL_THRESHOLD)
+                # Bound memory: only a couple of batches may wait on the encoder
+                while len(pending) > _MAX_PENDING_BATCHES:
+                    pending.popleft().result()
+        if batch:
+            pending.append(writer.submit(store.add_texts, batch, metas))
+        for fut in pending:
+            fut.result()
+    finally:
+        writer.shutdown(wait=True)
+    stale = [rec["id"] for recs in previous.values() for rec in recs]
+    # Provenance of reused chunks is corrected in the same write that drops stale ones
+    store.update_metadata(moved, delete=stale)
+    stats = {"chunks": pos, "embedded": embedded, "reused": reused, "removed": len(stale)}
+    return stats, "\n".join(head)[:ANALYSIS_CHARS]
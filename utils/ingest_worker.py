@@ -0,0 +1,252 @@
+# utils/ingest_worker.py
+from __future__ import annotations
+import os, sys, time, uuid, shutil, atexit, socket, hashlib, logging, threading
+import multiprocessing as mp
+from typing import Iterable, Tuple, List, BinaryIO
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+SPOOL_DIR = os.environ.get("INGEST_SPOOL_DIR", "./.ingest_spool")
+# Uploads larger than this are rejected while being spooled
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "100")) * 1024 * 1024
+_SPOOL_CHUNK = 1024 * 1024
+_LEASE_SECONDS = 120
+_HEARTBEAT_SECONDS = 30
+_POLL_SECONDS = 1.0
+_PROGRESS_EVERY_S = 1.0
+
+_IMAGE_FALLBACK = "[Image uploaded; install easyocr to OCR locally, or enable multimodal LLM to interpret directly.]"
+
+_procs: List[mp.Process] = []
+_procs_lock = threading.Lock()
+_atexit_registered = False
+
+def ensure_workers(n: int = INGEST_WORKERS):
+    """Start the ingestion worker processes for this server, once."""
+    global _atexit_registered
+    with _procs_lock:
+        _procs[:] = [p for p in _procs if p.is_alive()]
+        ctx = mp.get_context("spawn")
+        while len(_procs) < max(1, n):
+            # Not daemonic: workers use process pools of their own (PDF, embeddings)
+            p = ctx.Process(target=run_worker, name="ingest-worker")
+            p.start()
+            _procs.append(p)
+        if not _atexit_registered:
+            atexit.register(_stop_workers)
+            _atexit_registered = True
+
+def _stop_workers():
+    for p in _procs:
+        if p.is_alive():
+            p.terminate()
+    for p in _procs:
+        p.join(timeout=5)
+
+def spool_path(job_id: str, idx: int, name: str) -> str:
+    """Spool file for the job's ``idx``-th upload; the index keeps same-named uploads apart."""
+    d = os.path.join(SPOOL_DIR, job_id)
+    os.makedirs(d, exist_ok=True)
+    return os.path.join(d, f"{idx}_{os.path.basename(name)}")
+
+class UploadTooLarge(ValueError):
+    pass
+
+def spool_upload(src: BinaryIO, path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[int, str]:
+    """Copy an upload to ``path`` in fixed-size chunks, hashing as it goes, so no extra
+    full-size copy is held in memory. Returns (size, sha256 hex); raises UploadTooLarge
+    (and removes the partial file) past ``max_bytes``.
+    """
+    h = hashlib.sha256()
+    size = 0
+    src.seek(0)
+    try:
+        with open(path, "wb") as out:
+            while True:
+                block = src.read(_SPOOL_CHUNK)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"larger than {max_bytes // (1024 * 1024)} MB")
+                h.update(block)
+                out.write(block)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return size, h.hexdigest()
+
+class _Heartbeat:
+    """Renews the job lease while a worker is busy (long LLM calls, big PDFs)."""
+    def __init__(self, job_id: str, worker_id: str):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(job_id, worker_id), daemon=True)
+
+    def _run(self, job_id, worker_id):
+        from data.ingest_jobs import renew_lease
+        while not self._stop.wait(_HEARTBEAT_SECONDS):
+            try:
+                renew_lease(job_id, worker_id, _LEASE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Lease renewal failed for job {job_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+def _with_progress(job_id: str, idx: int, pages: Iterable[Tuple[int, str]]):
+    from data.ingest_jobs import update_file
+    last = 0.0
+    page_no = 0
+    for page_no, text in pages:
+        yield page_no, text
+        if time.monotonic() - last >= _PROGRESS_EVERY_S:
+            update_file(job_id, idx, {"pages_done": page_no})
+            last = time.monotonic()
+    update_file(job_id, idx, {"pages_done": page_no})
+
+def process_job(job: dict):
+    """Run every unfinished file of a job. Each step is recorded on the job document
+    and skipped when already done, so a reclaimed job resumes where it stopped.
+    LLM analyses run concurrently on a bounded pool: a file's analysis starts as soon
+    as its leading text is extracted and is persisted the moment it returns, while
+    the worker moves on to embedding the rest of the file and the next ones.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from data.ingest_jobs import update_file, update_files
+    from data.documents import upsert_document, upsert_documents
+    from utils.ingestion import iter_pdf_pages, pdf_page_count, extract_text_from_images
+    from utils.ingest_pipeline import index_pages
+    from utils.vector_store import ProjectVectorStore
+    from utils.glm_client import ANALYSIS_CONCURRENCY
+
+    job_id = job["_id"]
+    store = ProjectVectorStore.for_project(job["project_id"])
+    files = job["files"]
+
+    # OCR the job's outstanding images in one batch; OCR workers open the spooled files
+    ocr_idx = [i for i, f in enumerate(files) if f["kind"] == "image" and not f.get("indexed")]
+    ocr_texts = {}
+    if ocr_idx:
+        ocr_texts = dict(zip(ocr_idx, extract_text_from_images([files[i]["path"] for i in ocr_idx])))
+
+    glm = None
+    glm_lock = threading.Lock()
+    analyses = {}
+
+    def document_meta(f):
+        meta = {"file": f["name"], "analysis": f["analysis"], "size": f.get("size", 0), "kind": f["kind"]}
+        if f.get("indexed"):
+            meta.update(chunks=f.get("chunks", 0), content_hash=f.get("content_hash"))
+        return meta
+
+    def analyze(idx, f, head):
+        nonlocal glm
+        with glm_lock:
+            if glm is None:
+                from utils.glm_client import GLMClient
+                glm = GLMClient()
+        f["analysis"] = glm.analyze_text(job.get("prompt", ""), head if head.strip() else f"(Image file: {f['name']})")
+        update_file(job_id, idx, {"analysis": f["analysis"]})
+        # Visible in the document list right away, even while chunks are still embedding
+        upsert_document(job["user_email"], job["project_id"], doc_id=f["name"], meta=document_meta(f))
+
+    def start_analysis(pool, idx, f, head):
+        if idx not in analyses and f.get("analysis") is None:
+            analyses[idx] = pool.submit(analyze, idx, f, head)
+
+    with ThreadPoolExecutor(max_workers=max(1, ANALYSIS_CONCURRENCY), thread_name_prefix="analyze") as pool:
+        for idx, f in enumerate(files):
+            if f["state"] == "done":
+                continue
+            try:
+                if not f.get("indexed"):
+                    pages = iter(())
+                    if f["kind"] == "pdf":
+                        update_file(job_id, idx, {"state": "indexing", "pages_total": pdf_page_count(f["path"])})
+                        pages = iter_pdf_pages(f["path"])
+                    elif f["kind"] == "image":
+                        update_file(job_id, idx, {"state": "indexing", "pages_total": 1})
+                        pages = iter([(1, ocr_texts.get(idx) or _IMAGE_FALLBACK)])
+                    stats, head = index_pages(store, f["name"], _with_progress(job_id, idx, pages),
+                                              on_head=lambda h, idx=idx, f=f: start_analysis(pool, idx, f, h))
+                    if not stats["chunks"]:
+                        store.add_texts(["(no text extracted)"], [{"type": "doc", "file": f["name"], "pos": 0}])
+                    f.update(indexed=True, chunks=stats["chunks"], head=head)
+                    update_file(job_id, idx, {"indexed": True, "chunks": stats["chunks"], "head": head})
+                # Resumed jobs: indexed earlier, analysis still outstanding
+                start_analysis(pool, idx, f, f.get("head") or "")
+                if f.get("analysis") is None:
+                    update_file(job_id, idx, {"state": "analyzing"})
+            except Exception as e:
+                logger.exception(f"Ingestion of {f['name']} in job {job_id} failed")
+                f["state"] = "error"
+                update_file(job_id, idx, {"state": "error", "error": str(e)})
+
+        finished = []
+        for idx, f in enumerate(files):
+            if f["state"] in ("done", "error"):
+                continue
+            try:
+                if idx in analyses:
+                    analyses[idx].result()
+                finished.append(idx)
+            except Exception as e:
+                logger.exception(f"Analysis of {f['name']} in job {job_id} failed")
+                update_file(job_id, idx, {"state": "error", "error": str(e)})
+
+    # Final document metadata and file states: one bulk write each for the whole job
+    try:
+        upsert_documents(job["user_email"], job["project_id"], {files[i]["name"]: document_meta(files[i]) for i in finished})
+    except Exception as e:
+        logger.exception(f"Saving documents of job {job_id} failed")
+        update_files(job_id, {i: {"state": "error", "error": str(e)} for i in finished})
+        return
+    update_files(job_id, {i: {"state": "done", "head": None} for i in finished})
+    for i in finished:
+        try:
+            os.remove(files[i]["path"])
+        except OSError:
+            pass
+
+def run_worker(worker_id: str = None):
+    """Claim and process jobs forever (one job at a time per worker process)."""
+    from data.ingest_jobs import claim_job, finish_job, get_job
+
+    logging.basicConfig(level=logging.INFO)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    while True:
+        try:
+            job = claim_job(worker_id, _LEASE_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not poll ingest jobs: {e}")
+            job = None
+        if not job:
+            time.sleep(_POLL_SECONDS)
+            continue
+        try:
+            with _Heartbeat(job["_id"], worker_id):
+                process_job(job)
+            done = get_job(job["_id"]) or job
+            failed = [f["name"] for f in done["files"] if f["state"] == "error"]
+            finish_job(job["_id"], "error" if failed else "done",
+                       error=f"Failed: {', '.join(failed)}" if failed else None)
+            if not failed:
+                shutil.rmtree(os.path.join(SPOOL_DIR, job["_id"]), ignore_errors=True)
+        except Exception as e:
+            logger.exception(f"Ingest job {job['_id']} failed")
+            finish_job(job["_id"], "error", error=str(e))
+
+if __name__ == "__main__":
+    # Standalone workers: python -m utils.ingest_worker [N]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else INGEST_WORKERS
+    ensure_workers(n)
+    for p in _procs:
+        p.join()
@@ -1,32 +1,166 @@
 # utils/ingestion.py
 from __future__ import annotations
-import io
-from typing import Tuple
+import io, os, mmap, atexit, tempfile, threading
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Iterator, List, Union
+import numpy as np
 from PIL import Image
 from pypdf import PdfReader
 
+# PDFs with at least this many pages are extracted in a process pool
+_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "32"))
+_PDF_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", "4"))
+_PAGES_PER_TASK = 8
+
+# Images are downscaled so their longest side is at most this many pixels before OCR
+_OCR_MAX_SIDE = int(os.environ.get("OCR_MAX_SIDE", "2000"))
+# OCR worker processes (0 = run OCR in this process)
+_OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "2"))
+
+_ocr_reader = None
+_ocr_pool = None
+_ocr_lock = threading.Lock()
+
+_pool = None
+_pool_workers = max(1, min(_PDF_WORKERS, os.cpu_count() or 1))
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=mp.get_context("spawn"))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+def _open_pdf(source: Union[bytes, str]) -> PdfReader:
+    if not isinstance(source, str):
+        return PdfReader(io.BytesIO(source))
+    if os.path.getsize(source) == 0:
+        return PdfReader(source)
+    # pypdf copies a path's whole file into memory; a read-only mmap is paged in from
+    # the page cache on demand instead, so big spooled uploads don't count against RSS
+    with open(source, "rb") as fh:
+        return PdfReader(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+
+def _page_text(page) -> str:
+    try:
+        return page.extract_text() or ""
+    except Exception:
+        # keep going
+        return ""
+
+def _extract_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    # Runs in a worker: each task opens the file itself, so no PDF bytes are pickled
+    reader = _open_pdf(path)
+    return [(i + 1, _page_text(reader.pages[i])) for i in range(start, end)]
+
+def iter_pdf_pages(source: Union[bytes, str], parallel: bool = True) -> Iterator[Tuple[int, str]]:
+    """Yield (page_no, text) in page order (1-based) as pages are extracted.
+    ``source`` is PDF bytes or a file path (memory-mapped, preferred for large files);
+    large documents fan out to a process pool with a bounded number of page ranges in flight.
+    """
+    reader = _open_pdf(source)
+    n = len(reader.pages)
+    if not parallel or n < _PARALLEL_MIN_PAGES:
+        for i, page in enumerate(reader.pages):
+            yield i + 1, _page_text(page)
+        return
+
+    tmp_path = None
+    path = source
+    if not isinstance(source, str):
+        # Workers need a path; spool the bytes once instead of pickling them per task
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        path = tmp_path
+    try:
+        pool = _get_pool()
+        ranges = deque((s, min(s + _PAGES_PER_TASK, n)) for s in range(0, n, _PAGES_PER_TASK))
+        in_flight = deque()
+        window = _pool_workers * 2
+        while ranges or in_flight:
+            while ranges and len(in_flight) < window:
+                s, e = ranges.popleft()
+                in_flight.append(pool.submit(_extract_range, path, s, e))
+            for item in in_flight.popleft().result():
+                yield item
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+
+def pdf_page_count(source: Union[bytes, str]) -> int:
+    return len(_open_pdf(source).pages)
+
 def extract_text_from_pdf(file_bytes: bytes) -> str:
-    reader = PdfReader(io.BytesIO(file_bytes))
+    return "\n".join(text for _, text in iter_pdf_pages(file_bytes)).strip()
+
+def _get_ocr_reader():
+    """easyocr reader, loaded once per process (None if easyocr isn't installed)."""
+    global _ocr_reader
+    with _ocr_lock:
+        if _ocr_reader is None:
+            try:
+                import easyocr  # type: ignore
+                _ocr_reader = easyocr.Reader(['en'], gpu=False)
+            except Exception:
+                _ocr_reader = False
+        return _ocr_reader or None
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    with _ocr_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(max_workers=_OCR_WORKERS, mp_context=mp.get_context("spawn"),
+                                            initializer=_get_ocr_reader)
+            atexit.register(_ocr_pool.shutdown, wait=False, cancel_futures=True)
+        return _ocr_pool
+
+def _prepare_image(source: Union[bytes, str]) -> np.ndarray:
+    # Paths are decoded straight from disk; the encoded file is never held in memory
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as img:
+        # JPEG can decode at reduced scale, so huge photos never materialize at full size
+        img.draft("RGB", (_OCR_MAX_SIDE, _OCR_MAX_SIDE))
+        img = img.convert("RGB")
+    # Detection cost grows with pixel count; large screenshots don't need full resolution
+    img.thumbnail((_OCR_MAX_SIDE, _OCR_MAX_SIDE))
+    return np.array(img)
+
+def _ocr_batch(images: List[Union[bytes, str]]) -> List[str]:
+    reader = _get_ocr_reader()
     out = []
-    for page in reader.pages:
+    for source in images:
         try:
-            out.append(page.extract_text() or "")
+            result = reader.readtext(_prepare_image(source), detail=0, batch_size=16) if reader else []
+            out.append("\n".join(result).strip())
         except Exception:
-            # keep going
-            pass
-    return "\n".join(out).strip()
+            out.append("")
+    return out
 
-def extract_text_from_image(file_bytes: bytes) -> str:
-    """Try local OCR first (easyocr), else return empty string and let upstream LLM handle it."""
+def extract_text_from_images(images: List[Union[bytes, str]]) -> List[str]:
+    """OCR many images (bytes or file paths) at once, spread across the OCR worker pool
+    (each worker keeps its own loaded reader). Pass paths for large files so only the
+    path is pickled to the workers. Returns "" for images that couldn't be read.
+    """
+    if not images:
+        return []
+    if _OCR_WORKERS <= 0:
+        return _ocr_batch(images)
     try:
-        import easyocr  # type: ignore
-        reader = easyocr.Reader(['en'], gpu=False)
-        img = Image.open(io.BytesIO(file_bytes)).convert("RGB")
-        result = reader.readtext(np.array(img), detail=0)  # type: ignore
-        return "\n".join(result).strip()
+        pool = _get_ocr_pool()
+        per_task = -(-len(images) // _OCR_WORKERS)
+        futures = [pool.submit(_ocr_batch, images[i:i + per_task]) for i in range(0, len(images), per_task)]
+        return [text for fut in futures for text in fut.result()]
     except Exception:
         # OCR not available; upstream can decide to send image to LLM if supported
-        return ""
+        return [""] * len(images)
+
+def extract_text_from_image(file_bytes: bytes) -> str:
+    """Try local OCR first (easyocr), else return empty string and let upstream LLM handle it."""
+    return extract_text_from_images([file_bytes])[0]
 
 def sniff_filetype(name: str) -> str:
     name = (name or "").lower()
@@ -0,0 +1,75 @@
+# utils/lexical_index.py
+from __future__ import annotations
+import math, re, heapq
+from typing import Dict, List, Optional, Tuple
+
+# Keep prices, versions and hyphenated names together: "19.99", "v2.1", "wi-fi"
+_TOKEN_RE = re.compile(r"\w+(?:[.,'\-]\w+)*", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+class InvertedIndex:
+    """In-memory BM25 index over record texts, keyed by the store's int vector ids.
+    Updated incrementally on add; removed docs are dropped from postings and stats.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_len: Dict[int, int] = {}
+        self._doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, vid: int, text: str):
+        if vid in self._doc_len:
+            self.remove(vid)
+        tokens = tokenize(text)
+        tf: Dict[str, int] = {}
+        for t in tokens:
+            tf[t] = tf.get(t, 0) + 1
+        for t, n in tf.items():
+            self._postings.setdefault(t, {})[vid] = n
+        self._doc_len[vid] = len(tokens)
+        self._doc_terms[vid] = tuple(tf)
+        self._total_len += len(tokens)
+
+    def remove(self, vid: int):
+        n = self._doc_len.pop(vid, None)
+        if n is None:
+            return
+        self._total_len -= n
+        for t in self._doc_terms.pop(vid, ()):
+            docs = self._postings.get(t)
+            if docs is not None:
+                docs.pop(vid, None)
+                if not docs:
+                    del self._postings[t]
+
+    def search(self, query: str, k: int = 10, exclude: Optional[set] = None,
+               allowed: Optional[set] = None) -> List[Tuple[int, float]]:
+        """Top-k (vid, bm25_score) pairs for ``query``."""
+        N = len(self._doc_len)
+        if not N:
+            return []
+        avgdl = self._total_len / N or 1.0
+        scores: Dict[int, float] = {}
+        for t in set(tokenize(query)):
+            docs = self._postings.get(t)
+            if not docs:
+                continue
+            idf = math.log(1 + (N - len(docs) + 0.5) / (len(docs) + 0.5))
+            for vid, tf in list(docs.items()):
+                if exclude and vid in exclude:
+                    continue
+                if allowed is not None and vid not in allowed:
+                    continue
+                dl = self._doc_len.get(vid)
+                if dl is None:  # removed by a concurrent delete
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * dl / avgdl)
+                scores[vid] = scores.get(vid, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
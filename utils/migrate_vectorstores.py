@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Rebuild every project vector store under VECTOR_BASE: re-embed live records and
+train a reducer for the requested dimension (or drop it with --dim 0).
+
+Usage:
+    python -m utils.migrate_vectorstores --dim 128 --kind pca
+"""
+import argparse
+import os
+
+from utils.vector_store import ProjectVectorStore, _REDUCE_DIM, _REDUCER_KIND
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dim", type=int, default=_REDUCE_DIM, help="target dimension, 0 = full")
+    ap.add_argument("--kind", choices=["pca", "random"], default=_REDUCER_KIND)
+    ap.add_argument("--base", default=os.environ.get("VECTOR_BASE", "./vectorstores"))
+    args = ap.parse_args()
+
+    for name in sorted(os.listdir(args.base)):
+        project_dir = os.path.join(args.base, name)
+        if not os.path.isfile(os.path.join(project_dir, "meta.jsonl")):
+            continue
+        store = ProjectVectorStore(project_dir)
+        n = store.rebuild(dim=args.dim, kind=args.kind)
+        print(f"{name}: {n} vectors -> dim {store.index.d if store.index is not None else '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# utils/onnx_embedder.py
+from __future__ import annotations
+import os
+from typing import List
+import numpy as np
+
+_ONNX_FILE = "model_quantized.onnx"
+_MAX_SEQ_LEN = 256  # same truncation as sentence-transformers/all-MiniLM-L6-v2
+
+class OnnxEmbedder:
+    """CPU embedder: int8-quantized ONNX export of a MiniLM-style encoder under ONNX Runtime.
+    Mirrors the sentence-transformers pipeline (truncate -> mean pool -> L2 normalize),
+    so vectors are interchangeable with the PyTorch backend.
+    """
+    def __init__(self, model_dir: str, model_name: str):
+        if not os.path.exists(os.path.join(model_dir, _ONNX_FILE)):
+            export_quantized_onnx(model_name, model_dir)
+
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(_MAX_SEQ_LEN)
+        self.tokenizer.enable_padding()
+        # Separate untruncated copy for measuring chunk lengths
+        self._counter = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._counter.no_truncation()
+        self._counter.no_padding()
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(os.environ.get("ONNX_NUM_THREADS", "0"))
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, _ONNX_FILE), opts, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._counter.encode(text, add_special_tokens=False).ids)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        out = []
+        for start in range(0, len(texts), batch_size):
+            enc = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            feed = {
+                "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in enc], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feed.items() if k in self.input_names})[0]
+            m = mask[..., None].astype(np.float32)
+            pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        if not out:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(out)
+
+def export_quantized_onnx(model_name: str, out_dir: str):
+    """One-time export: HF encoder -> ONNX (fp32) -> dynamic int8 quantization.
+    Needs torch + transformers (already present wherever sentence-transformers is).
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(out_dir, exist_ok=True)
+    tok = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tok(["export sample"], return_tensors="pt")
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    axes = {0: "batch", 1: "seq"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes,
+                          "last_hidden_state": axes},
+            opset_version=14,
+        )
+    quantize_dynamic(fp32_path, os.path.join(out_dir, _ONNX_FILE), weight_type=QuantType.QInt8)
+    tok.save_pretrained(out_dir)  # writes tokenizer.json for the fast tokenizer
+
+if __name__ == "__main__":
+    import sys
+    from utils.embeddings import _DEFAULT_MODEL, _ONNX_DIR
+    export_quantized_onnx(_DEFAULT_MODEL, sys.argv[1] if len(sys.argv) > 1 else _ONNX_DIR)
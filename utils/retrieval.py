@@ -0,0 +1,57 @@
+# utils/retrieval.py
+from __future__ import annotations
+import os
+from typing import List, Dict, Any, Iterable
+
+from utils.lexical_index import tokenize
+
+# Per-stage context budgets (approximate LLM tokens)
+GATHER_CONTEXT_TOKENS = int(os.environ.get("GATHER_CONTEXT_TOKENS", "1500"))
+CODEGEN_CONTEXT_TOKENS = int(os.environ.get("CODEGEN_CONTEXT_TOKENS", "1000"))
+
+# Chunks whose token sets overlap at least this much are treated as duplicates
+_DUP_JACCARD = 0.8
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars per token is close enough for budgeting English/Latin text
+    return max(1, len(text or "") // 4)
+
+def merge_hits(hit_lists: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Flatten per-query hit lists, keeping each record once at its best score."""
+    best: Dict[str, Dict[str, Any]] = {}
+    for hits in hit_lists:
+        for h in hits:
+            cur = best.get(h["id"])
+            if cur is None or h.get("score", 0.0) > cur.get("score", 0.0):
+                best[h["id"]] = h
+    return sorted(best.values(), key=lambda h: h.get("score", 0.0), reverse=True)
+
+def dedupe_hits(hits: List[Dict[str, Any]], threshold: float = _DUP_JACCARD) -> List[Dict[str, Any]]:
+    """Drop hits whose text is a near-duplicate of a higher-ranked hit."""
+    kept, kept_tokens = [], []
+    for h in hits:
+        toks = set(tokenize(h.get("text", "")))
+        if not toks:
+            continue
+        dup = False
+        for other in kept_tokens:
+            if len(toks & other) / len(toks | other) >= threshold:
+                dup = True
+                break
+        if not dup:
+            kept.append(h)
+            kept_tokens.append(toks)
+    return kept
+
+def pack_snippets(snippets: List[str], budget_tokens: int) -> List[str]:
+    """Greedily keep snippets (already ordered by value) that fit in the budget.
+    A snippet too large to fit whole is skipped so smaller ones can still use the space.
+    """
+    out, used = [], 0
+    for s in snippets:
+        cost = estimate_tokens(s)
+        if used + cost > budget_tokens:
+            continue
+        out.append(s)
+        used += cost
+    return out
@@ -1,79 +1,597 @@
 # utils/vector_store.py
 from __future__ import annotations
-import os, json, uuid
-from typing import List, Dict, Any, Optional
+import os, json, uuid, hashlib, threading
+from typing import List, Dict, Any, Optional, Iterable
 import numpy as np
 import faiss
 
-from utils.embeddings import Embeddings
+try:
+    import fcntl  # POSIX; on other platforms only threads in one process are serialized
+except ImportError:
+    fcntl = None
+
+from utils.embedding_service import EmbeddingService
+from utils.embedding_pool import EmbeddingPool, POOL_THRESHOLD
+from utils.lexical_index import InvertedIndex
+
+# Reciprocal-rank fusion constant (Cormack et al.); larger flattens rank differences
+_RRF_K = 60
+
+# Compact automatically once this fraction of stored vectors is tombstoned
+_COMPACT_RATIO = float(os.environ.get("VECTOR_COMPACT_RATIO", "0.3"))
+
+# Filters matching at most this fraction of the store are applied inside FAISS
+# (ID selector); broader filters post-filter an over-fetched result list.
+_PREFILTER_SELECTIVITY = float(os.environ.get("VECTOR_PREFILTER_SELECTIVITY", "0.2"))
+
+# Optional per-store dimensionality reduction (0 = keep full embedding dimension).
+# Trained once a store holds VECTOR_REDUCE_MIN_TRAIN vectors; "pca" or "random".
+_REDUCE_DIM = int(os.environ.get("VECTOR_REDUCE_DIM", "0"))
+_REDUCER_KIND = os.environ.get("VECTOR_REDUCER", "pca").lower()
+_REDUCE_MIN_TRAIN = int(os.environ.get("VECTOR_REDUCE_MIN_TRAIN", "1000"))
+
+class _StoreLock:
+    """Reentrant lock on one lock file in a store directory: a thread lock shared by
+    every instance in the process, plus an flock on the file held while the outermost
+    level is, so ingest workers and the app never write the same store at once.
+    """
+    def __init__(self, path: str):
+        self._path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._fh = open(self._path, "a+")
+                fcntl.flock(self._fh, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fh:
+                    self._fh.close()
+                    self._fh = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._fh is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+        self._rlock.release()
+
+# One lock per lock file, shared by every instance in the process
+_DIR_LOCKS: Dict[str, _StoreLock] = {}
+_DIR_LOCKS_GUARD = threading.Lock()
+
+def _dir_lock(project_dir: str, name: str = ".lock") -> _StoreLock:
+    key = os.path.join(os.path.abspath(project_dir), name)
+    with _DIR_LOCKS_GUARD:
+        if key not in _DIR_LOCKS:
+            _DIR_LOCKS[key] = _StoreLock(key)
+        return _DIR_LOCKS[key]
+
+def _vid(doc_id: str) -> int:
+    """Stable int64 FAISS id for a record id (12 hex chars -> 48 bits)."""
+    try:
+        return int(doc_id, 16)
+    except ValueError:
+        return int(uuid.uuid5(uuid.NAMESPACE_OID, doc_id).hex[:12], 16)
+
+def _make_reducer(kind: str, d_in: int, d_out: int):
+    if kind == "random":
+        return faiss.RandomRotationMatrix(d_in, d_out)
+    return faiss.PCAMatrix(d_in, d_out)
+
+def _project(vecs: np.ndarray, reducer) -> np.ndarray:
+    x = np.ascontiguousarray(vecs, dtype=np.float32)
+    if reducer is not None:
+        x = reducer.apply(x)
+        # Reduced vectors are no longer unit length; restore cosine = inner product
+        faiss.normalize_L2(x)
+    return x
+
+def _build_postings(records: Dict[int, Dict[str, Any]]) -> Dict[str, Dict[Any, set]]:
+    postings: Dict[str, Dict[Any, set]] = {}
+    for vid, rec in records.items():
+        _post(postings, vid, rec)
+    return postings
+
+def _post(postings: Dict[str, Dict[Any, set]], vid: int, rec: Dict[str, Any]):
+    # Only scalar metadata values are indexed (type, file, lang, source, ...)
+    for field, value in (rec.get("metadata") or {}).items():
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            postings.setdefault(field, {}).setdefault(value, set()).add(vid)
+
+def _build_lexical(records: Dict[int, Dict[str, Any]], tombstones: set) -> InvertedIndex:
+    # Only live records, so BM25 document counts and lengths ignore deleted chunks
+    lex = InvertedIndex()
+    for vid, rec in records.items():
+        if vid not in tombstones:
+            lex.add(vid, rec.get("text", ""))
+    return lex
 
 class ProjectVectorStore:
     """Simple FAISS (cosine) store per project, persisted to disk.
     Files:
-      - index.faiss (FAISS index)
+      - index.faiss (FAISS IndexIDMap2, vectors keyed by stable int ids)
       - meta.jsonl (one JSON per vector: {id, text, metadata})
+      - tombstones.json (ids deleted but not yet compacted away)
+      - reducer.faiss (optional PCA / random-projection transform applied to adds and queries)
+    A BM25 inverted index over the same records is built in memory on first hybrid_search.
+    Writers hold a per-directory file lock and first reload whatever another
+    process (or another instance) wrote since this instance last looked.
     """
     def __init__(self, project_dir: str):
         os.makedirs(project_dir, exist_ok=True)
         self.project_dir = project_dir
         self.index_path = os.path.join(project_dir, "index.faiss")
         self.meta_path  = os.path.join(project_dir, "meta.jsonl")
+        self.tomb_path  = os.path.join(project_dir, "tombstones.json")
+        self.reducer_path = os.path.join(project_dir, "reducer.faiss")
+        self._lock = _dir_lock(project_dir)
         self._dim = None
-        self.index = None
-        self._load()
+        # (index, reducer) swapped as one tuple so readers never pair mismatched dims
+        self._space = (None, None)
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._tombstones: set = set()
+        self._postings: Dict[str, Dict[Any, set]] = {}
+        self._lexical: Optional[InvertedIndex] = None
+        self._seen = None
+        with self._lock:
+            self._load()
+
+    def file_lock(self, file_name: str) -> _StoreLock:
+        """Lock held while one source file's chunks are diffed and rewritten (see
+        utils.ingest_pipeline.index_pages), so two jobs ingesting the same file take
+        turns instead of both embedding it. Separate from the store's writer lock.
+        """
+        digest = hashlib.sha1(file_name.encode("utf-8")).hexdigest()[:16]
+        return _dir_lock(self.project_dir, f".lock-{digest}")
+
+    def _stamp(self):
+        """(mtime, size) of every store file: changes whenever anyone rewrites the store."""
+        out = []
+        for path in (self.index_path, self.meta_path, self.tomb_path, self.reducer_path):
+            try:
+                st = os.stat(path)
+                out.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                out.append(None)
+        return tuple(out)
+
+    def _sync(self):
+        """Reload from disk if the files changed since we last read or wrote them.
+        Caller holds the lock.
+        """
+        if self._stamp() != self._seen:
+            self._load()
+
+    def _maybe_sync(self):
+        # Readers: cheap stat check, lock only when a reload is actually needed
+        if self._stamp() != self._seen:
+            with self._lock:
+                self._sync()
 
     def _load(self):
+        # Build complete new state first; lock-free readers only ever see whole generations
+        records: Dict[int, Dict[str, Any]] = {}
+        tombstones: set = set()
+        space = (None, None)
         if os.path.exists(self.meta_path):
-            # Peek a line to infer dim via embedding later only when needed
-            pass
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        records[_vid(rec["id"])] = rec
+        if os.path.exists(self.tomb_path):
+            with open(self.tomb_path, "r", encoding="utf-8") as f:
+                tombstones = set(json.load(f))
         if os.path.exists(self.index_path):
-            self.index = faiss.read_index(self.index_path)
+            reducer = faiss.read_VectorTransform(self.reducer_path) if os.path.exists(self.reducer_path) else None
+            space = (faiss.read_index(self.index_path), reducer)
+        self._space = space
+        self._records = records
+        self._postings = _build_postings(records)
+        self._lexical = None
+        self._tombstones = tombstones
+        if self.index is not None:
+            if not hasattr(self.index, "id_map"):
+                self._migrate_positional_index()
+        self._seen = self._stamp()
+
+    def _lex(self) -> InvertedIndex:
+        """BM25 index over the current records, built on first use."""
+        lex = self._lexical
+        if lex is None:
+            with self._lock:
+                if self._lexical is None:
+                    self._lexical = _build_lexical(self._records, self._tombstones)
+                lex = self._lexical
+        return lex
+
+    @property
+    def index(self):
+        return self._space[0]
+
+    @index.setter
+    def index(self, value):
+        self._space = (value, self._space[1])
+
+    @property
+    def reducer(self):
+        return self._space[1]
+
+    def _migrate_positional_index(self):
+        # Legacy stores mapped FAISS positions to meta.jsonl line order;
+        # rewrap the same vectors under ids derived from each record id.
+        with self._lock:
+            flat = self.index
+            n = flat.ntotal
+            vecs = flat.reconstruct_n(0, n) if n else np.zeros((0, flat.d), dtype=np.float32)
+            # Lines past the last vector never got one; they'd surface in filters, BM25
+            # and len() without ever matching a vector search, so they are dropped
+            records = dict(list(self._records.items())[:n])
+            ids = np.array(list(records.keys()), dtype=np.int64)
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(flat.d))
+            if n:
+                index.add_with_ids(vecs[:len(ids)], ids)
+            tmp_index = self.index_path + ".tmp"
+            faiss.write_index(index, tmp_index)
+            os.replace(tmp_index, self.index_path)
+            self.index = index
+            if len(records) < len(self._records):
+                tmp_meta = self.meta_path + ".tmp"
+                with open(tmp_meta, "w", encoding="utf-8") as f:
+                    for rec in records.values():
+                        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                os.replace(tmp_meta, self.meta_path)
+                self._records = records
+                self._postings = _build_postings(records)
+                self._tombstones = self._tombstones & records.keys()
 
     def _ensure_index(self, dim: int):
         if self.index is None:
             # Cosine sim = inner product on L2-normalized vectors
-            self.index = faiss.IndexFlatIP(dim)
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+    def _save_tombstones(self):
+        tmp = self.tomb_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(sorted(self._tombstones), f)
+        os.replace(tmp, self.tomb_path)
+        self._seen = self._stamp()
 
-    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+    def __len__(self) -> int:
+        return len(self._records) - len(self._tombstones)
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+                  embeddings: Optional[np.ndarray] = None) -> List[str]:
+        """Embed and append ``texts``. Pass ``embeddings`` if they were computed ahead
+        of time (e.g. via EmbeddingService.submit) to skip the encoder here.
+        """
         if not texts:
             return []
-        embs = Embeddings.embed(texts)
-        self._ensure_index(embs.shape[1])
-        self.index.add(embs.astype(np.float32))
-        ids = []
-        with open(self.meta_path, "a", encoding="utf-8") as f:
+        if embeddings is not None:
+            embs = embeddings
+        elif len(texts) >= POOL_THRESHOLD:
+            # Bulk ingestion: shard across the multi-process pool
+            embs = EmbeddingPool.instance().embed(texts)
+        else:
+            embs = EmbeddingService.instance().embed(texts)
+        with self._lock:
+            self._sync()
+            embs = _project(embs, self.reducer)
+            self._ensure_index(embs.shape[1])
+            ids, vids, recs = [], [], []
             for i, text in enumerate(texts):
                 doc_id = uuid.uuid4().hex[:12]
                 ids.append(doc_id)
+                vids.append(_vid(doc_id))
                 meta = (metadatas[i] if metadatas and i < len(metadatas) else {})
-                rec = { "id": doc_id, "text": text, "metadata": meta }
-                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-        faiss.write_index(self.index, self.index_path)
+                recs.append({ "id": doc_id, "text": text, "metadata": meta })
+            with open(self.meta_path, "a", encoding="utf-8") as f:
+                for rec in recs:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self.index.add_with_ids(embs, np.array(vids, dtype=np.int64))
+            faiss.write_index(self.index, self.index_path)
+            self._seen = self._stamp()
+            for vid, rec in zip(vids, recs):
+                self._records[vid] = rec
+                _post(self._postings, vid, rec)
+                if self._lexical is not None:
+                    self._lexical.add(vid, rec["text"])
+            if (_REDUCE_DIM and self.reducer is None and self.index.ntotal >= max(_REDUCE_MIN_TRAIN, self.index.d)
+                    and self.index.d > _REDUCE_DIM):
+                # Still full-dimension, so the stored vectors are valid training data
+                flat = faiss.downcast_index(self.index.index)
+                self._rebuild_reduced(faiss.vector_to_array(self.index.id_map),
+                                      flat.reconstruct_n(0, flat.ntotal), _REDUCE_DIM, _REDUCER_KIND)
         return ids
 
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        if self.index is None:
+    def _candidates(self, where: Dict[str, Any]) -> set:
+        """Live vids matching ``where``. Each value is either a scalar (equality)
+        or a list/tuple/set of accepted values; fields are ANDed together.
+        """
+        cand = None
+        for field, value in where.items():
+            by_value = self._postings.get(field, {})
+            values = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+            ids = set()
+            for v in values:
+                ids |= by_value.get(v, set())
+            cand = ids if cand is None else cand & ids
+            if not cand:
+                return set()
+        return (cand or set()) - self._tombstones
+
+    def ids_where(self, match: Dict[str, Any]) -> List[str]:
+        """Ids of live records whose metadata matches ``match`` (see ``_candidates``)."""
+        self._maybe_sync()
+        records = self._records
+        return [records[vid]["id"] for vid in self._candidates(match) if vid in records]
+
+    def records_where(self, match: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Live records (id, text, metadata) whose metadata matches ``match``."""
+        self._maybe_sync()
+        records = self._records
+        return [records[vid] for vid in self._candidates(match) if vid in records]
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Tombstone records by id. Vectors are dropped from disk on the next compaction."""
+        with self._lock:
+            self._sync()
+            dead = {_vid(i) for i in ids} & self._records.keys()
+            dead -= self._tombstones
+            if not dead:
+                return 0
+            self._tombstones = self._tombstones | dead
+            self._save_tombstones()
+            if self._lexical is not None:
+                for vid in dead:
+                    self._lexical.remove(vid)
+            if len(self._tombstones) > _COMPACT_RATIO * max(len(self._records), 1):
+                self.compact(background=True)
+            return len(dead)
+
+    def update_metadata(self, metadatas: Dict[str, Dict[str, Any]], delete: Iterable[str] = ()) -> int:
+        """Replace the metadata of records by id (vectors and text are kept) and
+        tombstone ``delete``, in one locked write. Returns the number of records changed.
+        """
+        with self._lock:
+            self._sync()
+            records = dict(self._records)
+            changed = 0
+            for doc_id, meta in metadatas.items():
+                vid = _vid(doc_id)
+                rec = records.get(vid)
+                if rec is not None and vid not in self._tombstones and rec.get("metadata") != meta:
+                    records[vid] = {**rec, "metadata": meta}
+                    changed += 1
+            if changed:
+                tmp_meta = self.meta_path + ".tmp"
+                with open(tmp_meta, "w", encoding="utf-8") as f:
+                    for rec in records.values():
+                        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                os.replace(tmp_meta, self.meta_path)
+                self._records = records
+                self._postings = _build_postings(records)
+                self._seen = self._stamp()
+            self.delete(delete)
+            return changed
+
+    def upsert_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+                     key: Optional[Dict[str, Any]] = None, embeddings: Optional[np.ndarray] = None) -> List[str]:
+        """Replace every live record matching ``key`` (e.g. {"file": name}) with ``texts``."""
+        with self._lock:
+            self._sync()
+            if key:
+                self.delete(self.ids_where(key))
+            return self.add_texts(texts, metadatas, embeddings=embeddings)
+
+    def _rebuild_reduced(self, vids: np.ndarray, full_vecs: np.ndarray, dim: Optional[int], kind: str):
+        """Train a reducer on full-dimension vectors (dim=None/0: no reducer) and
+        rebuild the index in the reduced space. Caller holds the lock.
+        Too few vectors to train on (fewer than VECTOR_REDUCE_MIN_TRAIN or the input
+        dimension) would give a degenerate projection, so those stores stay full size.
+        """
+        reducer = None
+        full_vecs = np.ascontiguousarray(full_vecs, dtype=np.float32)
+        d_in = full_vecs.shape[1]
+        if dim and dim < d_in and len(full_vecs) >= max(_REDUCE_MIN_TRAIN, d_in):
+            reducer = _make_reducer(kind, d_in, dim)
+            reducer.train(full_vecs)
+        vecs = _project(full_vecs, reducer)
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(vecs.shape[1]))
+        if len(vids):
+            index.add_with_ids(vecs, np.asarray(vids, dtype=np.int64))
+
+        tmp_index = self.index_path + ".tmp"
+        faiss.write_index(index, tmp_index)
+        if reducer is not None:
+            tmp_reducer = self.reducer_path + ".tmp"
+            faiss.write_VectorTransform(reducer, tmp_reducer)
+            os.replace(tmp_reducer, self.reducer_path)
+        elif os.path.exists(self.reducer_path):
+            os.remove(self.reducer_path)
+        os.replace(tmp_index, self.index_path)
+        self._space = (index, reducer)
+        self._seen = self._stamp()
+
+    def rebuild(self, dim: Optional[int] = _REDUCE_DIM, kind: str = _REDUCER_KIND) -> int:
+        """Re-embed every live record and rebuild the index, training a fresh reducer
+        for ``dim`` (0/None keeps full dimension; so do stores too small to train on,
+        see _rebuild_reduced). Used to migrate existing stores.
+        """
+        with self._lock:
+            self._sync()
+            self.compact()
+            vids = list(self._records.keys())
+            texts = [self._records[v]["text"] for v in vids]
+            if not texts:
+                return 0
+            embs = EmbeddingPool.instance().embed(texts) if len(texts) >= POOL_THRESHOLD \
+                else EmbeddingService.instance().embed(texts)
+            self._rebuild_reduced(np.array(vids, dtype=np.int64), embs, dim, kind)
+            return len(vids)
+
+    def compact(self, background: bool = False):
+        """Rewrite index and metadata without tombstoned records.
+        Readers keep using the previous in-memory index until the swap.
+        """
+        if background:
+            t = threading.Thread(target=self._compact, daemon=True)
+            t.start()
+            return t
+        return self._compact()
+
+    def _compact(self) -> int:
+        with self._lock:
+            # meta.jsonl is rewritten from _records: they must include every other writer's rows
+            self._sync()
+            dead = set(self._tombstones)
+            if not dead:
+                return 0
+            index = None
+            if self.index is not None:
+                index = faiss.clone_index(self.index)
+                index.remove_ids(np.array(sorted(dead), dtype=np.int64))
+            live = {vid: rec for vid, rec in self._records.items() if vid not in dead}
+
+            tmp_meta = self.meta_path + ".tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                for rec in live.values():
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            if index is not None:
+                tmp_index = self.index_path + ".tmp"
+                faiss.write_index(index, tmp_index)
+                # New index first: an old meta.jsonl is a superset, so lookups still resolve
+                os.replace(tmp_index, self.index_path)
+            os.replace(tmp_meta, self.meta_path)
+
+            # Swap in memory in the same order; tombstones are cleared last
+            self.index = index
+            self._records = live
+            self._postings = _build_postings(live)
+            self._lexical = None
+            self._tombstones = set()
+            self._save_tombstones()
+            return len(dead)
+
+    def search(self, query: str, k: int = 5, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Top-k records for ``query``, optionally restricted by a metadata filter,
+        e.g. ``where={"type": "doc"}`` or ``where={"lang": ["HTML", "CSS"]}``.
+        """
+        return self.search_many([query], k, where=where)[0]
+
+    def search_many(self, queries: List[str], k: int = 5,
+                    where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Batched ``search``: one encoder pass and one FAISS call for all queries.
+        Returns one hit list per query, in input order.
+        """
+        if not queries:
             return []
-        q = Embeddings.embed([query]).astype(np.float32)
-        D, I = self.index.search(q, min(k, self.index.ntotal))
-        # Retrieve rows from meta.jsonl by position order
-        # We'll stream the file and collect in order
-        hits = []
-        pos_map = {int(idx): score for idx, score in zip(I[0], D[0]) if idx >= 0}
-        if not pos_map:
+        self._maybe_sync()
+        index, reducer = self._space
+        if index is None or index.ntotal == 0:
+            return [[] for _ in queries]
+        q = _project(EmbeddingService.instance().embed(list(queries)), reducer)
+        return self._search_vectors(index, q, k, where)
+
+    def _search_vectors(self, index, q: np.ndarray, k: int,
+                        where: Optional[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        # Snapshot state so a concurrent compaction swap can't mix generations
+        tombstones = self._tombstones
+        records = self._records
+        ntotal = index.ntotal
+        nq = q.shape[0]
+
+        if not where:
+            # Over-fetch so tombstoned hits don't eat into k
+            D, I = index.search(q, min(k + len(tombstones), ntotal))
+            return [self._collect(I[r], D[r], k, records, tombstones) for r in range(nq)]
+
+        cand = self._candidates(where)
+        if not cand:
+            return [[] for _ in range(nq)]
+        selectivity = len(cand) / ntotal
+        if selectivity <= _PREFILTER_SELECTIVITY:
+            # Narrow filter: let FAISS only score the candidate ids
+            sel = faiss.IDSelectorBatch(np.array(sorted(cand), dtype=np.int64))
+            D, I = index.search(q, min(k, len(cand)), params=faiss.SearchParameters(sel=sel))
+            return [self._collect(I[r], D[r], k, records, tombstones) for r in range(nq)]
+
+        # Broad filter: over-fetch in proportion to selectivity, widen only the short rows
+        fetch = min(ntotal, int(k / selectivity * 1.5) + len(tombstones) + 1)
+        out: List[List[Dict[str, Any]]] = [[] for _ in range(nq)]
+        pending = list(range(nq))
+        while pending:
+            D, I = index.search(q[pending], fetch)
+            short = []
+            for row, r in enumerate(pending):
+                out[r] = self._collect(I[row], D[row], k, records, tombstones, cand)
+                if len(out[r]) < k and fetch < ntotal:
+                    short.append(r)
+            pending = short
+            fetch = min(ntotal, fetch * 2)
+        return out
+
+    def hybrid_search(self, query: str, k: int = 5, where: Optional[Dict[str, Any]] = None,
+                      fetch_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Fuse FAISS and BM25 rankings with reciprocal-rank fusion.
+        Each hit carries ``score`` (RRF) plus ``vector_score``/``bm25_score`` when present.
+        """
+        fetch_k = fetch_k or max(k * 4, 20)
+        self._maybe_sync()
+        lexical = self._lex()
+        records = self._records
+        tombstones = self._tombstones
+        allowed = self._candidates(where) if where else None
+        if allowed is not None and not allowed:
             return []
-        # Read all rows and pick those positions
-        rows = []
-        with open(self.meta_path, "r", encoding="utf-8") as f:
-            for line in f:
-                rows.append(json.loads(line))
-        for i, rec in enumerate(rows):
-            if i in pos_map:
-                rec_out = dict(rec)
-                rec_out["score"] = float(pos_map[i])
-                hits.append(rec_out)
-        # Sort by score desc
-        hits.sort(key=lambda r: r.get("score", 0.0), reverse=True)
+
+        fused: Dict[int, Dict[str, Any]] = {}
+        for rank, hit in enumerate(self.search(query, fetch_k, where=where)):
+            vid = _vid(hit["id"])
+            entry = fused.setdefault(vid, {"rrf": 0.0})
+            entry["rrf"] += 1.0 / (_RRF_K + rank + 1)
+            entry["vector_score"] = hit["score"]
+        for rank, (vid, score) in enumerate(lexical.search(query, fetch_k, exclude=tombstones, allowed=allowed)):
+            entry = fused.setdefault(vid, {"rrf": 0.0})
+            entry["rrf"] += 1.0 / (_RRF_K + rank + 1)
+            entry["bm25_score"] = score
+
+        hits = []
+        for vid, entry in sorted(fused.items(), key=lambda kv: kv[1]["rrf"], reverse=True):
+            if vid not in records:
+                continue
+            rec_out = dict(records[vid])
+            rec_out["score"] = entry.pop("rrf")
+            rec_out.update(entry)
+            hits.append(rec_out)
+            if len(hits) >= k:
+                break
+        return hits
+
+    @staticmethod
+    def _collect(ids, scores, k: int, records: Dict[int, Dict[str, Any]], tombstones: set,
+                 allowed: Optional[set] = None) -> List[Dict[str, Any]]:
+        hits = []
+        for vid, score in zip(ids, scores):
+            vid = int(vid)
+            if vid < 0 or vid in tombstones or vid not in records:
+                continue
+            if allowed is not None and vid not in allowed:
+                continue
+            rec_out = dict(records[vid])
+            rec_out["score"] = float(score)
+            hits.append(rec_out)
+            if len(hits) >= k:
+                break
         return hits
 
     @staticmethod
@@ -95,4 +613,5 @@ class ProjectVectorStore:
                 meta.update(extra_meta)
             metas.append(meta)
         if texts:
-            self.add_texts(texts, metas)
+            # Previous artifacts from the same source are superseded, not appended
+            self.upsert_texts(texts, metas, key={"type": "code", **(extra_meta or {})})
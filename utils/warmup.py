@@ -0,0 +1,31 @@
+# utils/warmup.py
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Set WARMUP_EMBEDDINGS=0 to load the model on first use instead
+_ENABLED = os.environ.get("WARMUP_EMBEDDINGS", "1") != "0"
+_started = False
+_lock = threading.Lock()
+
+def _warm():
+    try:
+        from utils.embeddings import Embeddings
+        Embeddings._get_model()
+        import utils.vector_store  # noqa: F401  (faiss)
+        logger.info("Embedding model warmed up")
+    except Exception as e:
+        logger.warning(f"Embedding warm-up failed: {e}")
+
+def start_warmup():
+    """Preload the embedding model on a daemon thread, once per process."""
+    global _started
+    if not _ENABLED:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_warm, name="embedding-warmup", daemon=True).start()